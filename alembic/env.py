@@ -18,6 +18,7 @@ if config.config_file_name is not None:
 from db.database import Base
 from users.models import User
 from occasions.models import Occasion
+from mail.models import EmailOutbox
 target_metadata = Base.metadata
 
 # other values from the config, defined by the needs of env.py,
@@ -0,0 +1,153 @@
+"""Convert occasion date columns to timestamps and add due index
+
+Revision ID: 1e77ae7f3377
+Revises: a654b6a581da
+Create Date: 2026-10-18 10:04:18.553910
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1e77ae7f3377'
+down_revision: Union[str, None] = 'a654b6a581da'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 10000
+COLUMNS = ('created', 'date', 'date_processed')
+
+
+def _to_timestamp(value):
+    # Matches how SQLAlchemy stores DateTime values on SQLite: naive UTC with microseconds
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def _to_offset_minutes(value):
+    # The offset the user entered the date in, which the timestamp column doesn't keep
+    if not value:
+        return None
+    offset = datetime.fromisoformat(value).utcoffset()
+    if offset is None:
+        return None
+    return int(offset.total_seconds() // 60)
+
+
+def _to_string(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.isoformat()
+
+
+def _id_batches(conn):
+    max_id = conn.execute(sa.text("SELECT max(id) FROM occasions")).scalar() or 0
+    for start in range(0, max_id + 1, BATCH_SIZE):
+        yield start, start + BATCH_SIZE
+
+
+def _backfill_offsets(conn):
+    for start, end in _id_batches(conn):
+        rows = conn.execute(
+            sa.text("SELECT id, date FROM occasions WHERE id >= :start AND id < :end AND date IS NOT NULL"),
+            {"start": start, "end": end}
+        ).fetchall()
+        offsets = [dict(id=row[0], utc_offset_minutes=_to_offset_minutes(row[1])) for row in rows]
+        offsets = [offset for offset in offsets if offset["utc_offset_minutes"] is not None]
+        if offsets:
+            conn.execute(sa.text("UPDATE occasions SET utc_offset_minutes = :utc_offset_minutes WHERE id = :id"), offsets)
+
+
+def _backfill(conn, source_suffix, target_suffix, convert):
+    select_columns = ", ".join(f"{column}{source_suffix}" for column in COLUMNS)
+    assignments = ", ".join(f"{column}{target_suffix} = :{column}" for column in COLUMNS)
+    for start, end in _id_batches(conn):
+        rows = conn.execute(
+            sa.text(f"SELECT id, {select_columns} FROM occasions WHERE id >= :start AND id < :end"),
+            {"start": start, "end": end}
+        ).fetchall()
+        if rows:
+            conn.execute(
+                sa.text(f"UPDATE occasions SET {assignments} WHERE id = :id"),
+                [dict(id=row[0], **{column: convert(value) for column, value in zip(COLUMNS, row[1:])}) for row in rows]
+            )
+
+
+def upgrade() -> None:
+    for column in COLUMNS:
+        op.add_column('occasions', sa.Column(f'{column}_ts', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('occasions', sa.Column('utc_offset_minutes', sa.Integer(), nullable=True))
+
+    # Each batch commits on its own, so row locks and WAL are bounded by the batch rather than the whole table
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        if conn.dialect.name == 'postgresql':
+            # Offset-less values were written as UTC, so parse them that way
+            conn.execute(sa.text("SET TIME ZONE 'UTC'"))
+            for start, end in _id_batches(conn):
+                conn.execute(
+                    sa.text(
+                        "UPDATE occasions SET "
+                        "created_ts = created::timestamptz, "
+                        "date_ts = NULLIF(date, '')::timestamptz, "
+                        "date_processed_ts = NULLIF(date_processed, '')::timestamptz "
+                        "WHERE id >= :start AND id < :end"
+                    ),
+                    {"start": start, "end": end}
+                )
+            conn.execute(sa.text("RESET TIME ZONE"))
+        else:
+            _backfill(conn, '', '_ts', _to_timestamp)
+        # The timestamps are converted to UTC, so the offset has to be kept before the strings are dropped
+        _backfill_offsets(conn)
+
+    with op.batch_alter_table('occasions') as batch_op:
+        for column in COLUMNS:
+            batch_op.drop_column(column)
+            batch_op.alter_column(
+                f'{column}_ts',
+                new_column_name=column,
+                existing_type=sa.DateTime(timezone=True),
+                nullable=column != 'created'
+            )
+
+    op.create_index(
+        'ix_occasions_due',
+        'occasions',
+        ['date', 'is_processing', 'processing_lease_expires_at', 'id'],
+        unique=False,
+        postgresql_where=sa.text("is_draft IS NOT true AND date_processed IS NULL"),
+        sqlite_where=sa.text("is_draft IS NOT 1 AND date_processed IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    op.drop_index('ix_occasions_due', table_name='occasions')
+    for column in COLUMNS:
+        op.add_column('occasions', sa.Column(f'{column}_str', sa.String(), nullable=True))
+
+    _backfill(conn, '', '_str', _to_string)
+    op.drop_column('occasions', 'utc_offset_minutes')
+
+    with op.batch_alter_table('occasions') as batch_op:
+        for column in COLUMNS:
+            batch_op.drop_column(column)
+            batch_op.alter_column(
+                f'{column}_str',
+                new_column_name=column,
+                existing_type=sa.String(),
+                nullable=column != 'created'
+            )
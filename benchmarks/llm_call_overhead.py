@@ -0,0 +1,165 @@
+"""Per-call overhead of generating a summary, before and after sharing the chain and HTTP client.
+
+Runs the summary chain against a local stub of the OpenAI chat completions endpoint, so only client-side overhead
+and connection setup are measured:
+
+    before: a new prompt template, ChatOpenAI model and HTTP client for every call
+    after:  the cached get_summary_chain() on the pooled HTTP client
+
+    python benchmarks/llm_call_overhead.py --calls 200 --concurrency 10
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for name, value in {
+    "DATABASE_URL": "sqlite://",
+    "JWT_SALT": "benchmark",
+    "JWT_ALGORITHM": "HS256",
+    "JWT_EXP_MINUTES": "30",
+    "MAILGUN_API_KEY": "benchmark",
+    "NEXT_PUBLIC_URL": "http://localhost",
+    "OPENAI_API_KEY": "benchmark",
+    "STRIPE_API_KEY": "benchmark",
+    "STRIPE_WEBHOOK_SECRET": "benchmark",
+    "STRIPE_PRICE_ID": "benchmark",
+    "GOOGLE_CLIENT_ID": "benchmark",
+    "REFRESH_TOKEN_SALT": "benchmark",
+}.items():
+    os.environ.setdefault(name, value)
+
+from langchain_core.output_parsers import StrOutputParser  # noqa: E402
+from langchain_core.prompts import PromptTemplate  # noqa: E402
+from langchain_openai import ChatOpenAI  # noqa: E402
+
+from config import get_settings  # noqa: E402
+from occasions.constants import LLM_PROMPT  # noqa: E402
+from occasions.llm import close_http_client, get_summary_chain  # noqa: E402
+
+settings = get_settings()
+
+INPUTS = {
+    "occasion_label": "Sam's birthday",
+    "occasion_date": "2030-03-01T09:00:00+01:00",
+    "occasion_type": "birthday",
+    "occasion_tone": "normal",
+    "custom_input": "Loves climbing"
+}
+COMPLETION = json.dumps({
+    "id": "chatcmpl-benchmark",
+    "object": "chat.completion",
+    "created": 0,
+    "model": settings.LLM_MODEL,
+    "choices": [{
+        "index": 0,
+        "message": {"role": "assistant", "content": "Happy birthday, Sam!"},
+        "finish_reason": "stop"
+    }],
+    "usage": {"prompt_tokens": 100, "completion_tokens": 10, "total_tokens": 110}
+}).encode("utf-8")
+
+
+RESPONSE = (
+    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+    + f"Content-Length: {len(COMPLETION)}\r\n\r\n".encode("ascii")
+    + COMPLETION
+)
+
+
+class StubCompletionsServer:
+    # A minimal keep-alive HTTP/1.1 server on its own event loop and thread, counting the connections it accepts
+    def __init__(self):
+        self.connections = 0
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(asyncio.start_server(self.handle, "127.0.0.1", 0, backlog=1024))
+        self.port = self.server.sockets[0].getsockname()[1]
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        try:
+            while True:
+                headers = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in headers.split(b"\r\n"):
+                    name, _, value = line.partition(b":")
+                    if name.strip().lower() == b"content-length":
+                        length = int(value)
+                await reader.readexactly(length)
+                writer.write(RESPONSE)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.server.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def build_chain_per_call():
+    # How summaries were generated before: everything is rebuilt for each occasion
+    model = ChatOpenAI(model=settings.LLM_MODEL)
+    prompt = PromptTemplate.from_template(LLM_PROMPT)
+    return prompt | model | StrOutputParser()
+
+
+async def measure(name: str, get_chain, calls: int, concurrency: int, server: StubCompletionsServer):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def call():
+        async with semaphore:
+            started = time.perf_counter()
+            await get_chain().ainvoke(INPUTS)
+            latencies.append(time.perf_counter() - started)
+
+    server.connections = 0
+    # The per-call clients are never closed, and requests stall when the garbage collector reclaims them mid-run
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(call() for _ in range(calls)))
+        elapsed = time.perf_counter() - started
+    finally:
+        gc.enable()
+        gc.collect()
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{name:>7} {calls / elapsed:>10.1f} {statistics.mean(latencies) * 1000:>10.2f} "
+        f"{statistics.median(latencies) * 1000:>10.2f} {p95 * 1000:>10.2f} {server.connections:>12}"
+    )
+
+
+async def main(args, server: StubCompletionsServer):
+    print(f"{args.calls} calls, concurrency {args.concurrency}, stub endpoint on {os.environ['OPENAI_BASE_URL']}")
+    print(f"{'':>7} {'calls/s':>10} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10} {'connections':>12}")
+    for _ in range(args.rounds):
+        await measure("before", build_chain_per_call, args.calls, args.concurrency, server)
+        await measure("after", get_summary_chain, args.calls, args.concurrency, server)
+    await close_http_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=2)
+    args = parser.parse_args()
+
+    server = StubCompletionsServer()
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.port}/v1"
+    try:
+        asyncio.run(main(args, server))
+    finally:
+        server.stop()
@@ -0,0 +1,147 @@
+"""Event-loop responsiveness while sending mail, before and after the async Mailgun transport.
+
+Sends messages to a local stub of the Mailgun messages endpoint that answers after a fixed delay, while a probe task
+measures how late the event loop wakes it up:
+
+    before: a blocking requests.post per message, as MailService.send_email used to do
+    after:  MailgunTransport on the pooled httpx client
+
+    python benchmarks/mail_loop_responsiveness.py --messages 200 --latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for name, value in {
+    "DATABASE_URL": "sqlite://",
+    "JWT_SALT": "benchmark",
+    "JWT_ALGORITHM": "HS256",
+    "JWT_EXP_MINUTES": "30",
+    "MAILGUN_API_KEY": "benchmark",
+    "NEXT_PUBLIC_URL": "http://localhost",
+    "OPENAI_API_KEY": "benchmark",
+    "STRIPE_API_KEY": "benchmark",
+    "STRIPE_WEBHOOK_SECRET": "benchmark",
+    "STRIPE_PRICE_ID": "benchmark",
+    "GOOGLE_CLIENT_ID": "benchmark",
+    "REFRESH_TOKEN_SALT": "benchmark",
+}.items():
+    os.environ.setdefault(name, value)
+
+BODY = b'{"id": "<benchmark@mg.example.com>", "message": "Queued. Thank you."}'
+RESPONSE = (
+    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+    + f"Content-Length: {len(BODY)}\r\n\r\n".encode("ascii")
+    + BODY
+)
+PROBE_INTERVAL = 0.005
+
+
+class StubMailgunServer:
+    # A minimal keep-alive HTTP/1.1 server on its own event loop and thread that answers every request after a delay
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(asyncio.start_server(self.handle, "127.0.0.1", 0, backlog=1024))
+        self.port = self.server.sockets[0].getsockname()[1]
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                headers = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in headers.split(b"\r\n"):
+                    name, _, value = line.partition(b":")
+                    if name.strip().lower() == b"content-length":
+                        length = int(value)
+                await reader.readexactly(length)
+                await asyncio.sleep(self.latency)
+                writer.write(RESPONSE)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.server.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def blocking_send(message):
+    import requests
+
+    # How mail was sent before: a blocking request straight from the coroutine
+    requests.post(
+        f"{os.environ['MAILGUN_API_URL']}/{os.environ['MAILGUN_DOMAIN']}/messages",
+        auth=("api", os.environ["MAILGUN_API_KEY"]),
+        data={"from": "bench@example.com", "to": [message.recipient], "subject": message.subject, "text": message.body}
+    ).raise_for_status()
+
+
+async def measure(name: str, send, messages: list):
+    lags = []
+    stopping = asyncio.Event()
+
+    async def probe():
+        while not stopping.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(PROBE_INTERVAL)
+            lags.append(time.perf_counter() - started - PROBE_INTERVAL)
+
+    prober = asyncio.create_task(probe())
+    await asyncio.sleep(PROBE_INTERVAL * 2)
+    started = time.perf_counter()
+    await asyncio.gather(*(send(message) for message in messages))
+    elapsed = time.perf_counter() - started
+    stopping.set()
+    await prober
+
+    lags.sort()
+    p99 = lags[max(0, int(len(lags) * 0.99) - 1)]
+    print(
+        f"{name:>7} {len(messages) / elapsed:>11.1f} {elapsed:>9.2f} {statistics.median(lags) * 1000:>12.2f} "
+        f"{p99 * 1000:>12.2f} {lags[-1] * 1000:>12.2f}"
+    )
+
+
+async def main(args):
+    from mail.services import OutgoingEmail
+    from mail.transports import MailgunTransport, close_mail_client
+
+    async def send_blocking(message):
+        blocking_send(message)
+
+    async def send_async(message):
+        await MailgunTransport().send([message])
+
+    messages = [
+        OutgoingEmail(recipient=f"user{i}@example.com", subject="Your occasion summary", body="Happy birthday, Sam!")
+        for i in range(args.messages)
+    ]
+    print(f"{args.messages} messages, {args.latency * 1000:.0f}ms endpoint latency, probe every {PROBE_INTERVAL * 1000:.0f}ms")
+    print(f"{'':>7} {'messages/s':>11} {'seconds':>9} {'p50 lag ms':>12} {'p99 lag ms':>12} {'max lag ms':>12}")
+    await measure("before", send_blocking, messages)
+    await measure("after", send_async, messages)
+    await close_mail_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server = StubMailgunServer(args.latency)
+    os.environ["MAILGUN_API_URL"] = f"http://127.0.0.1:{server.port}/v3"
+    os.environ["MAILGUN_DOMAIN"] = "mg.example.com"
+    try:
+        asyncio.run(main(args))
+    finally:
+        server.stop()
@@ -0,0 +1,152 @@
+"""Scheduler throughput at several processing concurrency levels.
+
+Seeds due occasions in a scratch SQLite database, replaces the LLM call with a fixed delay and runs
+process_ocassions once per level, reporting occasions per second and how many pool connections were in use:
+the time-weighted mean shows whether connections are held through the LLM call, the peak the short bursts around it.
+
+    python benchmarks/scheduler_throughput.py --occasions 500 --llm-latency 0.2 --levels 1 5 10 25 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from datetime import datetime, timezone, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+database_path = os.path.join(tempfile.mkdtemp(), "scheduler_throughput.db")
+for name, value in {
+    "DATABASE_URL": f"sqlite:///{database_path}",
+    "JWT_SALT": "benchmark",
+    "JWT_ALGORITHM": "HS256",
+    "JWT_EXP_MINUTES": "30",
+    "MAILGUN_API_KEY": "benchmark",
+    "NEXT_PUBLIC_URL": "http://localhost",
+    "OPENAI_API_KEY": "benchmark",
+    "STRIPE_API_KEY": "benchmark",
+    "STRIPE_WEBHOOK_SECRET": "benchmark",
+    "STRIPE_PRICE_ID": "benchmark",
+    "GOOGLE_CLIENT_ID": "benchmark",
+    "REFRESH_TOKEN_SALT": "benchmark",
+    "SUMMARY_CACHE_BACKEND": "none",
+    "LLM_REQUESTS_PER_MINUTE": "1000000",
+    "LLM_TOKENS_PER_MINUTE": "1000000000",
+}.items():
+    os.environ.setdefault(name, value)
+
+import sqlalchemy as sa  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from config import get_settings  # noqa: E402
+from db.database import AsyncSessionLocal, Base, async_engine, engine  # noqa: E402
+from mail.models import EmailOutbox  # noqa: E402
+from occasions.models import Occasion  # noqa: E402
+from occasions.services import OccasionService  # noqa: E402
+from occasions.tasks import process_ocassions  # noqa: E402
+from users.models import Credits, User  # noqa: E402
+
+settings = get_settings()
+
+
+class PoolUsage:
+    def __init__(self, pool):
+        self.checked_out = 0
+        self.peak = 0
+        self.area = 0.0
+        self.changed_at = self.started_at = time.perf_counter()
+        event.listen(pool, "checkout", self.on_checkout)
+        event.listen(pool, "checkin", self.on_checkin)
+
+    def on_checkout(self, *args):
+        self.record(1)
+        self.peak = max(self.peak, self.checked_out)
+
+    def on_checkin(self, *args):
+        self.record(-1)
+
+    def record(self, change: int):
+        now = time.perf_counter()
+        self.area += self.checked_out * (now - self.changed_at)
+        self.changed_at = now
+        self.checked_out += change
+
+    def reset(self):
+        self.record(0)
+        self.peak = self.checked_out
+        self.area = 0.0
+        self.started_at = self.changed_at
+
+    def mean(self):
+        self.record(0)
+        return self.area / max(self.changed_at - self.started_at, 1e-9)
+
+
+async def seed(count: int, run: int):
+    now = datetime.now(timezone.utc)
+    async with AsyncSessionLocal() as db:
+        user = await db.scalar(sa.select(User).where(User.email == "benchmark@example.com"))
+        if not user:
+            user = User(created=now, email="benchmark@example.com")
+            db.add(user)
+            await db.flush()
+            db.add(Credits(user_id=user.id, credits=0))
+        db.add_all([
+            Occasion(
+                created=now,
+                label=f"run {run} occasion {i}",
+                type="birthday",
+                tone="normal",
+                email=user.email,
+                date=now - timedelta(minutes=1),
+                next_due_at=now - timedelta(minutes=1),
+                user_id=user.id
+            )
+            for i in range(count)
+        ])
+        await db.commit()
+
+
+async def run_level(concurrency: int, count: int, run: int, usage: PoolUsage):
+    await seed(count, run)
+    settings.OCCASION_PROCESSING_CONCURRENCY = concurrency
+    usage.reset()
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        await process_ocassions(db)
+    elapsed = time.perf_counter() - started
+    mean_connections = usage.mean()
+
+    async with AsyncSessionLocal() as db:
+        pending = await db.scalar(sa.select(sa.func.count()).select_from(Occasion).where(
+            Occasion.label.startswith(f"run {run} "),
+            Occasion.date_processed.is_(None)
+        ))
+        await db.execute(sa.delete(EmailOutbox))
+        await db.commit()
+    print(f"{concurrency:>11} {count / elapsed:>12.1f} {elapsed:>8.2f} {mean_connections:>11.2f} {usage.peak:>11} {pending:>8}")
+
+
+async def main(args):
+    async def stub_summary_chain(self, inputs):
+        await asyncio.sleep(args.llm_latency)
+        return f"Summary for {inputs['occasion_label']}"
+
+    OccasionService._invoke_summary_chain = stub_summary_chain
+    Base.metadata.create_all(engine)
+    usage = PoolUsage(async_engine.sync_engine.pool)
+
+    print(f"{args.occasions} occasions per level, {args.llm_latency * 1000:.0f}ms LLM latency, pool size {settings.DATABASE_POOL_SIZE}+{settings.DATABASE_MAX_OVERFLOW}")
+    print(f"{'concurrency':>11} {'occasions/s':>12} {'seconds':>8} {'mean conns':>11} {'peak conns':>11} {'pending':>8}")
+    for run, concurrency in enumerate(args.levels):
+        await run_level(concurrency, args.occasions, run, usage)
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--occasions", type=int, default=500)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 5, 10, 25, 50])
+    asyncio.run(main(parser.parse_args()))
@@ -15,6 +15,75 @@ class Settings(BaseSettings):
     STRIPE_PRICE_ID: str
     GOOGLE_CLIENT_ID: str
     REFRESH_TOKEN_SALT: str
+    OCCASION_SCHEDULER_ENABLED: bool = True
+    OCCASION_SCHEDULER_SHUTDOWN_TIMEOUT_SECONDS: int = 30
+    OCCASION_WORKER_METRICS_PORT: int = 0
+    OCCASION_PROCESSING_CONCURRENCY: int = 10
+    OCCASION_CLAIM_PAGE_SIZE: int = 500
+    OCCASION_MAX_PER_TICK: int = 0
+    OCCASION_MAX_PER_USER_PER_TICK: int = 0
+    OCCASION_LEASE_SECONDS: int = 600
+    OCCASION_SCHEDULER_MODE: str = "poll"
+    OCCASION_SCHEDULER_MAX_SLEEP_SECONDS: int = 300
+    OCCASION_SCHEDULER_QUEUE_SIZE: int = 1000
+    OCCASION_PREGENERATE_WINDOW_SECONDS: int = 0
+    OCCASION_PREGENERATE_BATCH_SIZE: int = 100
+    OCCASION_BATCH_PROVIDER: str = "openai"
+    OCCASION_BATCH_DIR: str = "/tmp/occasion_batches"
+    OCCASION_BATCH_POLL_SECONDS: int = 60
+    OCCASION_BATCH_LEASE_SECONDS: int = 86400
+    OCCASION_BATCH_MAX_WAIT_SECONDS: int = 82800
+    LLM_MODEL: str = "gpt-4o-mini"
+    LLM_TIMEOUT_SECONDS: float = 60
+    LLM_CONNECT_TIMEOUT_SECONDS: float = 5
+    LLM_MAX_RETRIES: int = 0
+    LLM_REQUESTS_PER_MINUTE: int = 500
+    LLM_TOKENS_PER_MINUTE: int = 200000
+    LLM_ESTIMATED_COMPLETION_TOKENS: int = 300
+    LLM_RATE_LIMIT_RETRIES: int = 5
+    LLM_MAX_CONNECTIONS: int = 20
+    SUMMARY_CACHE_BACKEND: str = "memory"
+    SUMMARY_CACHE_MAX_SIZE: int = 10000
+    SUMMARY_CACHE_TTL_SECONDS: int = 86400
+    SUMMARY_CACHE_PURGE_INTERVAL_SECONDS: int = 3600
+    USER_CACHE_MAX_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: int = 30
+    GOOGLE_CERTS_URL: str = "https://www.googleapis.com/oauth2/v1/certs"
+    GOOGLE_CERTS_DEFAULT_MAX_AGE_SECONDS: int = 3600
+    GOOGLE_CERTS_MIN_REFRESH_SECONDS: int = 60
+    GOOGLE_HTTP_TIMEOUT_SECONDS: float = 5
+    GOOGLE_TOKEN_CACHE_MAX_SIZE: int = 10000
+    PASSWORD_HASH_MAX_WORKERS: int = 2
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT_SECONDS: float = 30
+    DATABASE_POOL_RECYCLE_SECONDS: int = 1800
+    DATABASE_POOL_PRE_PING: bool = True
+    DATABASE_STATEMENT_TIMEOUT_MS: int = 0
+    DATABASE_PGBOUNCER_TRANSACTION_MODE: bool = False
+    MAIL_TRANSPORT: str = "mailgun"
+    MAIL_FROM: str = "Occasion Alerts <mailgun@mg.occasionalerts.com>"
+    MAILGUN_API_URL: str = "https://api.mailgun.net/v3"
+    MAILGUN_DOMAIN: str = "mg.occasionalerts.com"
+    SMTP_HOST: str = "localhost"
+    SMTP_PORT: int = 25
+    SMTP_USERNAME: str = ""
+    SMTP_PASSWORD: str = ""
+    SMTP_USE_TLS: bool = False
+    MAIL_SINK_PATH: str = "/tmp/occasion_mail.mbox"
+    MAIL_DEFAULT_LOCALE: str = "en"
+    MAIL_TIMEOUT_SECONDS: float = 10
+    MAIL_CONNECT_TIMEOUT_SECONDS: float = 5
+    MAIL_MAX_CONCURRENCY: int = 20
+    MAIL_OUTBOX_DISPATCHER_ENABLED: bool = True
+    MAIL_OUTBOX_POLL_SECONDS: int = 5
+    MAIL_OUTBOX_BATCH_SIZE: int = 500
+    MAIL_OUTBOX_LEASE_SECONDS: int = 300
+    MAIL_OUTBOX_MAX_ATTEMPTS: int = 8
+    MAIL_OUTBOX_RETRY_SECONDS: int = 60
+    MAIL_OUTBOX_MAX_RETRY_SECONDS: int = 3600
+    MAIL_OUTBOX_RETENTION_SECONDS: int = 604800
+    MAIL_OUTBOX_PURGE_INTERVAL_SECONDS: int = 3600
 
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -1,17 +1,106 @@
+import uuid
+
 from config import get_settings
-from sqlalchemy import create_engine
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from db.metrics import POOL_CHECKOUT_WAIT, PoolCollector
 
 settings = get_settings()
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL.replace('postgres://', 'postgresql://')
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+class InstrumentedQueuePool(QueuePool):
+    engine_name = "sync"
+
+    def connect(self):
+        with POOL_CHECKOUT_WAIT.labels(engine=self.engine_name).time():
+            return super().connect()
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    engine_name = "async"
+
+    def connect(self):
+        with POOL_CHECKOUT_WAIT.labels(engine=self.engine_name).time():
+            return super().connect()
+
+
+def pool_options():
+    return {
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+        "pool_timeout": settings.DATABASE_POOL_TIMEOUT_SECONDS,
+        # Recycle before Postgres or a proxy drops idle connections, and ping so a dead one is replaced on checkout
+        "pool_recycle": settings.DATABASE_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DATABASE_POOL_PRE_PING
+    }
+
+
+def set_statement_timeout_per_transaction(engine):
+    # PgBouncer in transaction mode rejects startup options and hands each transaction a different server connection,
+    # so the timeout has to be set inside every transaction instead
+    @event.listens_for(engine, "begin")
+    def set_statement_timeout(connection):
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(settings.DATABASE_STATEMENT_TIMEOUT_MS)}")
+
+
+is_postgres = make_url(SQLALCHEMY_DATABASE_URL).get_backend_name() == "postgresql"
+use_transaction_timeout = is_postgres and settings.DATABASE_STATEMENT_TIMEOUT_MS > 0 and settings.DATABASE_PGBOUNCER_TRANSACTION_MODE
 
 connect_args = {"check_same_thread": False}
-if SQLALCHEMY_DATABASE_URL and 'postgres' in SQLALCHEMY_DATABASE_URL:
+if is_postgres:
     connect_args = {"sslmode": "require"}
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=connect_args)
+    if settings.DATABASE_STATEMENT_TIMEOUT_MS > 0 and not settings.DATABASE_PGBOUNCER_TRANSACTION_MODE:
+        connect_args["options"] = f"-c statement_timeout={settings.DATABASE_STATEMENT_TIMEOUT_MS}"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args=connect_args,
+    poolclass=InstrumentedQueuePool,
+    **pool_options()
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def get_async_database_url(url: str):
+    database_url = make_url(url)
+    return database_url.set(drivername=ASYNC_DRIVERS.get(database_url.get_backend_name(), database_url.drivername))
+
+
+ASYNC_DATABASE_URL = get_async_database_url(SQLALCHEMY_DATABASE_URL)
+async_connect_args = {}
+if is_postgres:
+    async_connect_args = {"ssl": "require"}
+    if settings.DATABASE_PGBOUNCER_TRANSACTION_MODE:
+        # Prepared statements live on one server connection, which transaction mode doesn't pin to us
+        async_connect_args.update({
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__"
+        })
+    elif settings.DATABASE_STATEMENT_TIMEOUT_MS > 0:
+        async_connect_args["server_settings"] = {"statement_timeout": str(settings.DATABASE_STATEMENT_TIMEOUT_MS)}
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args=async_connect_args,
+    poolclass=InstrumentedAsyncQueuePool,
+    **pool_options()
+)
+# Nothing is expired on commit: reloading an attribute afterwards would need an implicit query, which async sessions can't do
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+if use_transaction_timeout:
+    set_statement_timeout_per_transaction(engine)
+    set_statement_timeout_per_transaction(async_engine.sync_engine)
+
+REGISTRY.register(PoolCollector({"sync": engine, "async": async_engine.sync_engine}))
+
 Base = declarative_base()
 
 
@@ -20,4 +109,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,45 @@
+from prometheus_client import Histogram
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy.pool import QueuePool
+
+from config import get_settings
+
+settings = get_settings()
+
+CHECKOUT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_seconds",
+    "Time to check a connection out of the pool, including waiting for a free one",
+    ["engine"],
+    buckets=CHECKOUT_BUCKETS
+)
+
+
+class PoolCollector:
+    # Reads the pools' own counters at scrape time
+    def __init__(self, engines: dict):
+        self.engines = engines
+
+    def collect(self):
+        size = GaugeMetricFamily("db_pool_size", "Connections the pool keeps open", labels=["engine"])
+        checked_out = GaugeMetricFamily("db_pool_checked_out", "Connections currently checked out", labels=["engine"])
+        overflow = GaugeMetricFamily("db_pool_overflow", "Connections open beyond the pool size", labels=["engine"])
+        utilisation = GaugeMetricFamily(
+            "db_pool_utilisation",
+            "Checked out connections as a fraction of pool size plus max overflow",
+            labels=["engine"]
+        )
+        for name, engine in self.engines.items():
+            pool = engine.pool
+            if not isinstance(pool, QueuePool):
+                continue
+            capacity = pool.size() + max(0, settings.DATABASE_MAX_OVERFLOW)
+            size.add_metric([name], pool.size())
+            checked_out.add_metric([name], pool.checkedout())
+            overflow.add_metric([name], max(0, pool.overflow()))
+            utilisation.add_metric([name], pool.checkedout() / capacity if capacity else 0)
+        yield size
+        yield checked_out
+        yield overflow
+        yield utilisation
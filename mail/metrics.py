@@ -0,0 +1,23 @@
+from prometheus_client import Counter, Histogram
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BATCH_SIZE_BUCKETS = (1, 5, 10, 50, 100, 500, 1000)
+
+MAIL_BATCH_SEND_LATENCY = Histogram(
+    "mail_batch_send_latency_seconds",
+    "Latency of handing one batch of outbox messages to the mail transport, a single API call for Mailgun",
+    buckets=LATENCY_BUCKETS
+)
+MAIL_BATCH_SIZE = Histogram(
+    "mail_batch_size",
+    "Number of outbox messages sent per transport batch",
+    buckets=BATCH_SIZE_BUCKETS
+)
+MAIL_SEND_ERRORS = Counter(
+    "mail_send_errors_total",
+    "Outbox batches the mail transport failed to send"
+)
+MAIL_OUTBOX_PURGED = Counter(
+    "mail_outbox_purged_total",
+    "Sent outbox messages deleted after the retention period"
+)
@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, text
+
+from db.database import Base
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    html = Column(Text, nullable=True)
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=True)
+    claimed_by = Column(String, nullable=True)
+    last_error = Column(Text, nullable=True)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Covers the dispatcher's scan: pending messages only, oldest retry first
+        Index(
+            "ix_email_outbox_due",
+            "next_attempt_at", "id",
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'"),
+        ),
+        # Covers the retention purge of sent messages
+        Index(
+            "ix_email_outbox_sent",
+            "sent_at",
+            postgresql_where=text("status = 'sent'"),
+            sqlite_where=text("status = 'sent'"),
+        ),
+    )
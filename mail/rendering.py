@@ -0,0 +1,83 @@
+import logging
+import os
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, TemplateNotFound, select_autoescape
+from markupsafe import Markup, escape
+from typing import NamedTuple, Optional
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
+PARTS = ("subject.txt", "txt", "html")
+
+
+class RenderedEmail(NamedTuple):
+    subject: str
+    body: str
+    html: Optional[str]
+
+
+def paragraphs(value: str):
+    # Plain text from the summary becomes escaped HTML paragraphs
+    blocks = [block.strip() for block in str(value).split("\n\n") if block.strip()]
+    return Markup("\n".join(
+        "<p>" + "<br>".join(escape(line) for line in block.splitlines()) + "</p>" for block in blocks
+    ))
+
+
+class EmailTemplates:
+    def __init__(self, directory: str, default_locale: str):
+        self.default_locale = default_locale
+        self.environment = Environment(
+            loader=FileSystemLoader(directory),
+            autoescape=select_autoescape(["html"]),
+            undefined=StrictUndefined,
+            auto_reload=False,
+            cache_size=-1
+        )
+        self.environment.filters["paragraphs"] = paragraphs
+        self._resolved = {}
+        self._compile(directory)
+
+    def _compile(self, directory: str):
+        # Compile every template up front so rendering never touches the filesystem or the parser
+        names = self.environment.list_templates()
+        for name in names:
+            self.environment.get_template(name)
+        logger.info(f"Compiled {len(names)} email templates from {directory}")
+
+    def render(self, name: str, locale: Optional[str] = None, **context):
+        locale = locale or self.default_locale
+        subject_template, body_template, html_template = self._templates(name, locale)
+        context["locale"] = locale
+        subject = subject_template.render(context).strip()
+        return RenderedEmail(
+            subject=subject,
+            body=body_template.render(context),
+            html=html_template.render(context, title=subject) if html_template else None
+        )
+
+    def _templates(self, name: str, locale: str):
+        key = (name, locale)
+        if key not in self._resolved:
+            templates = tuple(self._resolve(name, part, locale) for part in PARTS)
+            if not templates[0] or not templates[1]:
+                raise ValueError(f"Email template {name} needs a subject and a text part")
+            self._resolved[key] = templates
+        return self._resolved[key]
+
+    def _resolve(self, name: str, part: str, locale: str):
+        # Each part falls back on its own: "es-MX" tries es-MX, then es, then the default locale
+        candidates = [locale, locale.split("-")[0].split("_")[0], self.default_locale]
+        for candidate in dict.fromkeys(candidates):
+            try:
+                return self.environment.get_template(f"{candidate}/{name}.{part}")
+            except TemplateNotFound:
+                continue
+        return None
+
+
+email_templates = EmailTemplates(TEMPLATE_DIR, settings.MAIL_DEFAULT_LOCALE)
@@ -1,32 +1,172 @@
-import requests
+import logging
+
+from datetime import datetime, timezone, timedelta
+from typing import List, NamedTuple, Optional
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+
 from config import get_settings
+from mail.models import EmailOutbox
+from mail.rendering import email_templates
+from mail.transports import get_mail_transport
 
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
 
+class OutgoingEmail(NamedTuple):
+    recipient: str
+    subject: str
+    body: str
+    html: Optional[str] = None
+
+
 class MailService:
-    def send_email(self, recipient_email, subject, body):
-        settings = get_settings()
-        requests.post(
-            "https://api.mailgun.net/v3/mg.occasionalerts.com/messages",
-            auth=("api", settings.MAILGUN_API_KEY),
-            data={
-                "from": "Occasion Alerts <mailgun@mg.occasionalerts.com>",
-                "to": [recipient_email],
-                "subject": subject,
-                "text": body
-            }
+    async def send_batch(self, messages: List):
+        await get_mail_transport().send(messages)
+
+
+class OutboxService:
+    def enqueue_email(self, db: AsyncSession, recipient_email, subject, body, html=None):
+        # Only added to the session: the message is committed, or rolled back, with the caller's transaction
+        message = EmailOutbox(
+            created_at=datetime.now(timezone.utc),
+            recipient=recipient_email,
+            subject=subject,
+            body=body,
+            html=html,
+            status="pending",
+            attempts=0,
+            next_attempt_at=datetime.now(timezone.utc)
         )
+        db.add(message)
+        return message
+
+    def enqueue_template(self, db: AsyncSession, recipient_email, template, locale=None, **context):
+        rendered = email_templates.render(template, locale, **context)
+        return self.enqueue_email(db, recipient_email, rendered.subject, rendered.body, rendered.html)
 
-    def send_verification_email(self, recipient_email, verification_url):
-        subject = "Verify your email"
-        body = f"Click the link to verify your email: {verification_url}"
-        self.send_email(recipient_email, subject, body)
+    def enqueue_summary_email(self, db: AsyncSession, recipient_email, label, summary, locale=None):
+        return self.enqueue_template(db, recipient_email, "summary", locale, label=label, summary=summary)
 
-    def send_password_reset_email(self, recipient_email, reset_hash):
+    def enqueue_verification_email(self, db: AsyncSession, recipient_email, verification_url, locale=None):
+        return self.enqueue_template(db, recipient_email, "verification", locale, verification_url=verification_url)
+
+    def enqueue_password_reset_email(self, db: AsyncSession, recipient_email, reset_hash, locale=None):
         reset_link = f"{settings.NEXT_PUBLIC_URL}/account/reset-password?hash={reset_hash}"
+        return self.enqueue_template(db, recipient_email, "password_reset", locale, reset_link=reset_link)
+
+    async def claim_due_messages(self, db: AsyncSession, worker_id: str, limit: int):
+        now = datetime.now(timezone.utc)
+        # The claim is a lease: a dispatcher that dies mid-send leaves the messages to be retried once it expires
+        lease_expires_at = now + timedelta(seconds=settings.MAIL_OUTBOX_LEASE_SECONDS)
+        due = sa.and_(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now)
+        claim = {
+            EmailOutbox.claimed_by: worker_id,
+            EmailOutbox.next_attempt_at: lease_expires_at,
+            EmailOutbox.attempts: EmailOutbox.attempts + 1
+        }
+
+        try:
+            if db.get_bind().dialect.name == 'postgresql':
+                claimed_ids = (await db.scalars(sa.select(EmailOutbox.id).where(due).order_by(
+                    EmailOutbox.next_attempt_at, EmailOutbox.id
+                ).limit(limit).with_for_update(skip_locked=True))).all()
+                if claimed_ids:
+                    await db.execute(
+                        sa.update(EmailOutbox).where(EmailOutbox.id.in_(claimed_ids)).values(claim),
+                        execution_options={"synchronize_session": False}
+                    )
+            else:
+                candidates = sa.select(EmailOutbox.id).where(due).order_by(
+                    EmailOutbox.next_attempt_at, EmailOutbox.id
+                ).limit(limit)
+                await db.execute(
+                    sa.update(EmailOutbox).where(EmailOutbox.id.in_(candidates)).values(claim),
+                    execution_options={"synchronize_session": False}
+                )
+            await db.commit()
+            # Plain rows rather than entities, so later commits in the dispatcher don't expire and reload them
+            return (await db.execute(
+                sa.select(
+                    EmailOutbox.id,
+                    EmailOutbox.recipient,
+                    EmailOutbox.subject,
+                    EmailOutbox.body,
+                    EmailOutbox.html,
+                    EmailOutbox.attempts
+                ).where(
+                    EmailOutbox.status == "pending",
+                    EmailOutbox.claimed_by == worker_id,
+                    EmailOutbox.next_attempt_at == lease_expires_at
+                ).order_by(EmailOutbox.id)
+            )).all()
+        except Exception:
+            await db.rollback()
+            raise
+
+    async def mark_sent(self, db: AsyncSession, messages: List):
+        await db.execute(
+            sa.update(EmailOutbox).where(EmailOutbox.id.in_([message.id for message in messages])).values({
+                EmailOutbox.status: "sent",
+                EmailOutbox.sent_at: datetime.now(timezone.utc),
+                EmailOutbox.next_attempt_at: None,
+                EmailOutbox.claimed_by: None,
+                EmailOutbox.last_error: None
+            }),
+            execution_options={"synchronize_session": False}
+        )
+        await db.commit()
+
+    async def mark_failed(self, db: AsyncSession, messages: List, error: str):
+        now = datetime.now(timezone.utc)
+        outbox_table = EmailOutbox.__table__
+        updates = []
+        for message in messages:
+            if message.attempts >= settings.MAIL_OUTBOX_MAX_ATTEMPTS:
+                status, next_attempt_at = "failed", None
+            else:
+                backoff = settings.MAIL_OUTBOX_RETRY_SECONDS * 2 ** (message.attempts - 1)
+                status = "pending"
+                next_attempt_at = now + timedelta(seconds=min(settings.MAIL_OUTBOX_MAX_RETRY_SECONDS, backoff))
+            updates.append({
+                "message_id": message.id,
+                "status": status,
+                "next_attempt_at": next_attempt_at,
+                "claimed_by": None,
+                "last_error": error
+            })
+
+        await db.execute(
+            sa.update(outbox_table).where(outbox_table.c.id == sa.bindparam("message_id")).values(
+                status=sa.bindparam("status"),
+                next_attempt_at=sa.bindparam("next_attempt_at"),
+                claimed_by=sa.bindparam("claimed_by"),
+                last_error=sa.bindparam("last_error")
+            ),
+            updates
+        )
+        await db.commit()
+        failed = sum(1 for update in updates if update["status"] == "failed")
+        if failed:
+            logger.error(f"Gave up on {failed} outbox messages after {settings.MAIL_OUTBOX_MAX_ATTEMPTS} attempts")
 
-        subject = "Reset your password"
-        body = f"Click the link to reset your password: {reset_link}"
-        self.send_email(recipient_email, subject, body)
\ No newline at end of file
+    async def purge_sent(self, db: AsyncSession, retention_seconds: int, batch_size: int):
+        # Failed messages are kept for investigation; sent ones only until the retention period is over
+        sent_before = datetime.now(timezone.utc) - timedelta(seconds=retention_seconds)
+        purged = 0
+        while True:
+            expired_ids = sa.select(EmailOutbox.id).where(
+                EmailOutbox.status == "sent",
+                EmailOutbox.sent_at < sent_before
+            ).limit(batch_size)
+            result = await db.execute(
+                sa.delete(EmailOutbox).where(EmailOutbox.id.in_(expired_ids)),
+                execution_options={"synchronize_session": False}
+            )
+            await db.commit()
+            purged += result.rowcount
+            if result.rowcount < batch_size:
+                return purged
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+
+from config import get_settings
+from db.database import AsyncSessionLocal
+from mail.metrics import MAIL_BATCH_SEND_LATENCY, MAIL_BATCH_SIZE, MAIL_OUTBOX_PURGED, MAIL_SEND_ERRORS
+from mail.services import MailService, OutboxService
+from tasks.utils import WORKER_ID, repeat_func
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def recipient_batches(messages: List):
+    # Mailgun keys recipient-variables by address, so a recipient can only appear once per batch,
+    # and a batch either has an HTML part for every message or for none of them
+    batches = []
+    for message in messages:
+        has_html = message.html is not None
+        for batch_has_html, batch in batches:
+            if batch_has_html == has_html and message.recipient not in batch:
+                batch[message.recipient] = message
+                break
+        else:
+            batches.append((has_html, {message.recipient: message}))
+    return [list(batch.values()) for _, batch in batches]
+
+
+async def dispatch_outbox(db: AsyncSession, worker_id: str = WORKER_ID):
+    service = OutboxService()
+    mail_service = MailService()
+    limit = settings.MAIL_OUTBOX_BATCH_SIZE
+
+    # Drain everything that is due, one claimed batch at a time
+    while True:
+        messages = await service.claim_due_messages(db, worker_id, limit)
+        if not messages:
+            return
+
+        for batch in recipient_batches(messages):
+            try:
+                MAIL_BATCH_SIZE.observe(len(batch))
+                with MAIL_BATCH_SEND_LATENCY.time():
+                    await mail_service.send_batch(batch)
+                await service.mark_sent(db, batch)
+                logger.info(f"Sent {len(batch)} outbox messages")
+            except Exception as e:
+                MAIL_SEND_ERRORS.inc()
+                logger.error(f"Error sending {len(batch)} outbox messages: {str(e)}")
+                await db.rollback()
+                await service.mark_failed(db, batch, str(e))
+
+        if len(messages) < limit:
+            return
+
+
+class OutboxTasks():
+    def __init__(self):
+        self.task = None
+        self._stopping = asyncio.Event()
+        self._purged_at = None
+
+    def init(self):
+        logger.info("Creating outbox dispatcher task")
+        self.task = asyncio.create_task(repeat_func(settings.MAIL_OUTBOX_POLL_SECONDS, self.run_tick, self._stopping))
+        return self.task
+
+    async def stop(self, timeout: float):
+        if not self.task:
+            return
+
+        logger.info("Stopping outbox dispatcher")
+        self._stopping.set()
+        try:
+            # Let the current batch finish so sent messages are marked before the process exits
+            await asyncio.wait_for(asyncio.shield(self.task), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Outbox dispatcher did not finish within {timeout}s, cancelling")
+            self.task.cancel()
+        except Exception as e:
+            logger.error(f"Outbox dispatcher stopped with an error: {str(e)}")
+
+    async def run_tick(self):
+        db = AsyncSessionLocal()
+        try:
+            await dispatch_outbox(db)
+        except Exception as e:
+            logger.error(f"Error dispatching the email outbox: {str(e)}")
+        finally:
+            await db.close()
+        await self.purge_sent()
+
+    async def purge_sent(self):
+        now = time.monotonic()
+        if self._purged_at is not None and now - self._purged_at < settings.MAIL_OUTBOX_PURGE_INTERVAL_SECONDS:
+            return
+        self._purged_at = now
+
+        db = AsyncSessionLocal()
+        try:
+            purged = await OutboxService().purge_sent(
+                db,
+                settings.MAIL_OUTBOX_RETENTION_SECONDS,
+                settings.MAIL_OUTBOX_BATCH_SIZE
+            )
+            MAIL_OUTBOX_PURGED.inc(purged)
+            logger.info(f"Purged {purged} sent outbox messages")
+        except Exception as e:
+            logger.error(f"Error purging sent outbox messages: {str(e)}")
+            await db.rollback()
+        finally:
+            await db.close()
@@ -0,0 +1,165 @@
+import asyncio
+import httpx
+import json
+import logging
+import smtplib
+import time
+import uuid
+
+from email.header import Header
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formatdate, parseaddr
+from functools import lru_cache
+from typing import List
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Caps in-flight sends so a burst of summaries queues here instead of piling up connections
+_send_slots = asyncio.Semaphore(max(1, settings.MAIL_MAX_CONCURRENCY))
+
+
+@lru_cache
+def get_mail_client():
+    return httpx.AsyncClient(
+        base_url=f"{settings.MAILGUN_API_URL}/{settings.MAILGUN_DOMAIN}",
+        auth=("api", settings.MAILGUN_API_KEY),
+        timeout=httpx.Timeout(settings.MAIL_TIMEOUT_SECONDS, connect=settings.MAIL_CONNECT_TIMEOUT_SECONDS),
+        limits=httpx.Limits(
+            max_connections=settings.MAIL_MAX_CONCURRENCY,
+            max_keepalive_connections=settings.MAIL_MAX_CONCURRENCY
+        )
+    )
+
+
+async def close_mail_client():
+    if get_mail_client.cache_info().currsize:
+        await get_mail_client().aclose()
+        get_mail_client.cache_clear()
+
+
+def build_message(message):
+    # The compat32 MIME classes are several times faster to build than EmailMessage
+    if message.html:
+        email_message = MIMEMultipart("alternative")
+        email_message.attach(MIMEText(message.body, "plain", "utf-8"))
+        email_message.attach(MIMEText(message.html, "html", "utf-8"))
+    else:
+        email_message = MIMEText(message.body, "plain", "utf-8")
+    email_message["From"] = settings.MAIL_FROM
+    email_message["To"] = message.recipient
+    email_message["Subject"] = _encode_header(message.subject)
+    email_message["Date"] = formatdate()
+    return email_message
+
+
+def _encode_header(value: str):
+    return value if value.isascii() else Header(value, "utf-8").encode()
+
+
+def format_mbox_entry(message, envelope: str, date: str):
+    # Minimal hand-written MIME for the local sink; the email package's generator costs close to a millisecond
+    headers = (
+        f"{envelope}From: {settings.MAIL_FROM}\nTo: {message.recipient}\n"
+        f"Subject: {_encode_header(message.subject)}\nDate: {date}\nMIME-Version: 1.0\n"
+    )
+    if not message.html:
+        content = f"{headers}Content-Type: text/plain; charset=utf-8\nContent-Transfer-Encoding: 8bit\n\n{message.body}"
+    else:
+        boundary = f"=_{uuid.uuid4().hex}"
+        content = (
+            f"{headers}Content-Type: multipart/alternative; boundary=\"{boundary}\"\n\n"
+            f"--{boundary}\nContent-Type: text/plain; charset=utf-8\nContent-Transfer-Encoding: 8bit\n\n{message.body}\n"
+            f"--{boundary}\nContent-Type: text/html; charset=utf-8\nContent-Transfer-Encoding: 8bit\n\n{message.html}\n"
+            f"--{boundary}--"
+        )
+    return content.replace("\nFrom ", "\n>From ") + "\n\n"
+
+
+class MailgunTransport:
+    async def send(self, messages: List):
+        if len(messages) == 1:
+            message = messages[0]
+            data = {"from": settings.MAIL_FROM, "to": [message.recipient], "subject": message.subject, "text": message.body}
+            if message.html:
+                data["html"] = message.html
+        else:
+            # One call for many recipients; each gets their own subject and body through recipient-variables.
+            # Recipients must be unique within a batch since variables are keyed by address, and either all
+            # or none of the messages carry an HTML part.
+            data = {
+                "from": settings.MAIL_FROM,
+                "to": [message.recipient for message in messages],
+                "subject": "%recipient.subject%",
+                "text": "%recipient.body%",
+                "recipient-variables": json.dumps({
+                    message.recipient: {"subject": message.subject, "body": message.body, "html": message.html}
+                    for message in messages
+                })
+            }
+            if messages[0].html:
+                data["html"] = "%recipient.html%"
+
+        async with _send_slots:
+            response = await get_mail_client().post("/messages", data=data)
+        response.raise_for_status()
+
+
+class SmtpTransport:
+    async def send(self, messages: List):
+        # smtplib is blocking, so each batch goes out over one connection on a worker thread
+        async with _send_slots:
+            await asyncio.to_thread(self._send, messages)
+
+    def _send(self, messages: List):
+        with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=settings.MAIL_TIMEOUT_SECONDS) as smtp:
+            if settings.SMTP_USE_TLS:
+                smtp.starttls()
+            if settings.SMTP_USERNAME:
+                smtp.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+            for message in messages:
+                smtp.send_message(build_message(message))
+
+
+class MboxTransport:
+    # Local sink: appends every message to an mbox file instead of delivering it
+    def __init__(self):
+        self._lock = asyncio.Lock()
+
+    async def send(self, messages: List):
+        async with self._lock:
+            await asyncio.to_thread(self._write, messages)
+
+    def _write(self, messages: List):
+        envelope = f"From {parseaddr(settings.MAIL_FROM)[1] or 'MAILER-DAEMON'} {time.asctime(time.gmtime())}\n"
+        date = formatdate()
+        with open(settings.MAIL_SINK_PATH, "a", encoding="utf-8") as mbox:
+            mbox.writelines(format_mbox_entry(message, envelope, date) for message in messages)
+
+
+class MemoryTransport:
+    # Records messages in memory for tests and load runs
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, messages: List):
+        self.sent.extend((message.recipient, message.subject, message.body, message.html) for message in messages)
+
+
+TRANSPORTS = {
+    "mailgun": MailgunTransport,
+    "smtp": SmtpTransport,
+    "mbox": MboxTransport,
+    "memory": MemoryTransport,
+}
+
+
+@lru_cache
+def get_mail_transport():
+    if settings.MAIL_TRANSPORT not in TRANSPORTS:
+        raise ValueError(f"Unknown mail transport {settings.MAIL_TRANSPORT}")
+    logger.info(f"Using {settings.MAIL_TRANSPORT} mail transport")
+    return TRANSPORTS[settings.MAIL_TRANSPORT]()
@@ -1,19 +1,45 @@
 import logging
 from fastapi import FastAPI
 
+from config import get_settings
+from db.database import async_engine
+from mail.transports import close_mail_client
+from mail.tasks import OutboxTasks
+from metrics import routes as metrics_routes
 from occasions import routes as occasion_routes
+from occasions.llm import close_http_client
 from occasions.tasks import OccasionTasks as occasion_tasks
 
 from users import routes as user_routes
+from users.google_auth import close_google_http_client
+from users.passwords import shutdown_password_executor
 
 app = FastAPI()
+settings = get_settings()
+scheduler = occasion_tasks()
+outbox = OutboxTasks()
 
 app.include_router(occasion_routes.router)
 app.include_router(user_routes.router)
+app.include_router(metrics_routes.router)
 
 logging.basicConfig(level=logging.INFO)
 
 
 @app.on_event("startup")
 async def startup_event():
-    occasion_tasks().init()
+    if settings.OCCASION_SCHEDULER_ENABLED:
+        scheduler.init()
+    if settings.MAIL_OUTBOX_DISPATCHER_ENABLED:
+        outbox.init()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await scheduler.stop(settings.OCCASION_SCHEDULER_SHUTDOWN_TIMEOUT_SECONDS)
+    await outbox.stop(settings.OCCASION_SCHEDULER_SHUTDOWN_TIMEOUT_SECONDS)
+    await close_http_client()
+    await close_mail_client()
+    await close_google_http_client()
+    shutdown_password_executor()
+    await async_engine.dispose()
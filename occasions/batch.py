@@ -0,0 +1,141 @@
+import json
+import logging
+import os
+import uuid
+
+from datetime import datetime, timezone
+from openai import AsyncOpenAI
+from typing import AsyncIterable, Optional
+
+from config import get_settings
+from occasions.exceptions import BatchFailedException
+from occasions.llm import SUMMARY_PROMPT, get_http_client, summary_inputs
+from occasions.models import Occasion
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+
+async def write_batch_requests(occasions: AsyncIterable[Occasion], directory: str):
+    os.makedirs(directory, exist_ok=True)
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    request_path = os.path.join(directory, f"occasions-{timestamp}-{uuid.uuid4().hex[:8]}.jsonl")
+    with open(request_path, "w") as request_file:
+        async for occasion in occasions:
+            request_file.write(json.dumps({
+                "custom_id": str(occasion.id),
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": {
+                    "model": settings.LLM_MODEL,
+                    "messages": [{"role": "user", "content": SUMMARY_PROMPT.format(**summary_inputs(occasion))}]
+                }
+            }) + "\n")
+    return request_path
+
+
+def read_batch_results(output_path: str):
+    with open(output_path) as output_file:
+        for line in output_file:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            occasion_id = int(result["custom_id"])
+            response = result.get("response") or {}
+            if result.get("error") or response.get("status_code") != 200:
+                logger.error(f"Batch request for occasion {occasion_id} failed. {result.get('error')}")
+                continue
+            yield occasion_id, response["body"]["choices"][0]["message"]["content"]
+
+
+class OpenAIBatchProvider:
+    def __init__(self):
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, http_client=get_http_client())
+
+    async def submit(self, request_path: str):
+        with open(request_path, "rb") as request_file:
+            uploaded = await self.client.files.create(file=request_file, purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window="24h"
+        )
+        logger.info(f"Submitted batch {batch.id} from {request_path}")
+        return batch.id
+
+    async def poll(self, batch_id: str) -> Optional[str]:
+        batch = await self.client.batches.retrieve(batch_id)
+        if batch.status in ("failed", "expired", "cancelled"):
+            raise BatchFailedException(f"Batch {batch_id} finished with status {batch.status}")
+        if batch.status != "completed":
+            return None
+        if not batch.output_file_id:
+            raise BatchFailedException(f"Batch {batch_id} completed without an output file")
+
+        # The batch may be collected by a different process than the one that submitted it
+        os.makedirs(settings.OCCASION_BATCH_DIR, exist_ok=True)
+        output_path = os.path.join(settings.OCCASION_BATCH_DIR, f"{batch_id}.output.jsonl")
+        content = await self.client.files.content(batch.output_file_id)
+        with open(output_path, "wb") as output_file:
+            output_file.write(content.content)
+        return output_path
+
+    async def cancel(self, batch_id: str):
+        await self.client.batches.cancel(batch_id)
+        logger.info(f"Cancelled batch {batch_id}")
+
+
+class LocalBatchProvider:
+    # Offline stand-in: answers every request in the file with a canned completion
+    async def submit(self, request_path: str):
+        return request_path
+
+    async def poll(self, batch_id: str) -> Optional[str]:
+        output_path = f"{os.path.splitext(batch_id)[0]}.output.jsonl"
+        with open(batch_id) as request_file, open(output_path, "w") as output_file:
+            for line in request_file:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                output_file.write(json.dumps({
+                    "id": f"batch_req_{uuid.uuid4().hex}",
+                    "custom_id": request["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": {
+                            "model": request["body"]["model"],
+                            "choices": [{
+                                "index": 0,
+                                "message": {
+                                    "role": "assistant",
+                                    "content": f"Local batch summary for occasion {request['custom_id']}"
+                                }
+                            }]
+                        }
+                    },
+                    "error": None
+                }) + "\n")
+        return output_path
+
+    async def cancel(self, batch_id: str):
+        pass
+
+
+def remove_batch_files(*paths: Optional[str]):
+    for path in paths:
+        if not path:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as exc:
+            logger.error(f"Error removing batch file {path}. {exc}")
+
+
+def get_batch_provider():
+    if settings.OCCASION_BATCH_PROVIDER == "local":
+        return LocalBatchProvider()
+    return OpenAIBatchProvider()
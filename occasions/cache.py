@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import logging
+import time
+
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+
+from config import get_settings
+import sqlalchemy as sa
+
+from db.database import AsyncSessionLocal
+from occasions.models import SummaryCacheEntry
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class SummaryCache:
+    def __init__(self, backend: str, max_size: int, ttl_seconds: int, purge_interval_seconds: int = 3600):
+        self.backend = backend
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.purge_interval_seconds = purge_interval_seconds
+        self._purged_at = None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+
+    @staticmethod
+    def key(prompt: str, model: str):
+        return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+    async def get_or_generate(self, key: str, model: str, generate):
+        if self.backend == "none":
+            return await generate()
+
+        summary = await self._get(key)
+        if summary is not None:
+            self.hits += 1
+            return summary
+
+        # Identical prompts processed concurrently share a single LLM call
+        if key in self._pending:
+            self.hits += 1
+            pending = self._pending[key]
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Only the caller that started the shared call was cancelled, so make the call ourselves
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+            return await self.get_or_generate(key, model, generate)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            summary = await generate()
+            await self._set(key, model, summary)
+            future.set_result(summary)
+            return summary
+        except asyncio.CancelledError:
+            # Waiters must not hang on a call that will never finish
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Mark the exception as retrieved so a future nobody awaited doesn't log a warning
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+
+    def clear(self):
+        self._entries.clear()
+
+    async def purge_expired(self):
+        # Expired rows are never read again, so delete them rather than let the table grow without bound
+        if self.backend != "database":
+            return
+        now = time.monotonic()
+        if self._purged_at is not None and now - self._purged_at < self.purge_interval_seconds:
+            return
+        self._purged_at = now
+
+        db = AsyncSessionLocal()
+        try:
+            result = await db.execute(sa.delete(SummaryCacheEntry).where(
+                SummaryCacheEntry.created_at <= datetime.now(timezone.utc) - timedelta(seconds=self.ttl_seconds)
+            ))
+            await db.commit()
+            logger.info(f"Purged {result.rowcount} expired summary cache entries")
+        except Exception as exc:
+            logger.error(f"Error purging expired summary cache entries. {exc}")
+            await db.rollback()
+        finally:
+            await db.close()
+
+    async def _get(self, key: str):
+        entry = self._entries.get(key)
+        if entry:
+            expires_at, summary = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                return summary
+            del self._entries[key]
+
+        if self.backend == "database":
+            summary = await self._get_persisted(key)
+            if summary is not None:
+                self._remember(key, summary)
+            return summary
+        return None
+
+    async def _set(self, key: str, model: str, summary: str):
+        self._remember(key, summary)
+        if self.backend == "database":
+            await self._persist(key, model, summary)
+
+    def _remember(self, key: str, summary: str):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, summary)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def _get_persisted(self, key: str):
+        db = AsyncSessionLocal()
+        try:
+            return await db.scalar(sa.select(SummaryCacheEntry.summary).where(
+                SummaryCacheEntry.key == key,
+                SummaryCacheEntry.created_at > datetime.now(timezone.utc) - timedelta(seconds=self.ttl_seconds)
+            ))
+        except Exception as exc:
+            logger.error(f"Error reading summary cache entry {key}. {exc}")
+            return None
+        finally:
+            await db.close()
+
+    async def _persist(self, key: str, model: str, summary: str):
+        db = AsyncSessionLocal()
+        try:
+            await db.merge(SummaryCacheEntry(key=key, model=model, summary=summary, created_at=datetime.now(timezone.utc)))
+            await db.commit()
+        except Exception as exc:
+            logger.error(f"Error writing summary cache entry {key}. {exc}")
+            await db.rollback()
+        finally:
+            await db.close()
+
+
+summary_cache = SummaryCache(
+    backend=settings.SUMMARY_CACHE_BACKEND,
+    max_size=settings.SUMMARY_CACHE_MAX_SIZE,
+    ttl_seconds=settings.SUMMARY_CACHE_TTL_SECONDS,
+    purge_interval_seconds=settings.SUMMARY_CACHE_PURGE_INTERVAL_SECONDS
+)
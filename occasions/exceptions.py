@@ -0,0 +1,2 @@
+class BatchFailedException(Exception):
+    pass
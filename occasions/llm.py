@@ -0,0 +1,58 @@
+import httpx
+import logging
+
+from functools import lru_cache
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_openai import ChatOpenAI
+
+from config import get_settings
+from occasions.constants import LLM_PROMPT
+from occasions.models import Occasion
+from occasions.utils import as_local
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+SUMMARY_PROMPT = PromptTemplate.from_template(LLM_PROMPT)
+
+
+def summary_inputs(occasion: Occasion):
+    return {
+        "occasion_label": occasion.label,
+        # Recurring occasions are summarised for the occurrence being delivered
+        "occasion_date": as_local(occasion.next_due_at or occasion.date, occasion.utc_offset_minutes).isoformat(),
+        "occasion_type": occasion.type,
+        "occasion_tone": occasion.tone,
+        "custom_input": occasion.custom_input
+    }
+
+
+@lru_cache
+def get_http_client():
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.LLM_TIMEOUT_SECONDS, connect=settings.LLM_CONNECT_TIMEOUT_SECONDS),
+        limits=httpx.Limits(
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_CONNECTIONS
+        )
+    )
+
+
+@lru_cache
+def get_summary_chain():
+    logger.info(f"Building summary chain for model {settings.LLM_MODEL}")
+    model = ChatOpenAI(
+        model=settings.LLM_MODEL,
+        request_timeout=settings.LLM_TIMEOUT_SECONDS,
+        max_retries=settings.LLM_MAX_RETRIES,
+        http_async_client=get_http_client()
+    )
+    return SUMMARY_PROMPT | model | StrOutputParser()
+
+
+async def close_http_client():
+    if get_http_client.cache_info().currsize:
+        await get_http_client().aclose()
+        get_http_client.cache_clear()
+        get_summary_chain.cache_clear()
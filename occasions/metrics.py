@@ -0,0 +1,48 @@
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from occasions.cache import summary_cache
+from occasions.rate_limit import llm_rate_limiter
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+LAG_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 21600, 86400)
+BATCH_SIZE_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+
+DELIVERY_LAG = Histogram(
+    "occasion_delivery_lag_seconds",
+    "Time between an occasion's due date and it being processed",
+    buckets=LAG_BUCKETS
+)
+LLM_LATENCY = Histogram(
+    "occasion_llm_latency_seconds",
+    "Latency of LLM summary generation calls",
+    buckets=LATENCY_BUCKETS
+)
+TICK_BATCH_SIZE = Histogram(
+    "occasion_tick_batch_size",
+    "Number of occasions claimed per scheduler tick",
+    buckets=BATCH_SIZE_BUCKETS
+)
+TICK_DURATION = Histogram(
+    "occasion_tick_duration_seconds",
+    "Wall time of a scheduler tick",
+    buckets=LATENCY_BUCKETS + (300, 600, 1800, 3600)
+)
+PROCESSING_ERRORS = Counter(
+    "occasion_processing_errors_total",
+    "Errors raised while processing occasions, by stage",
+    ["stage"]
+)
+
+
+class OccasionCollector:
+    # Reads counters kept by the summary cache and rate limiter at scrape time
+    def collect(self):
+        yield CounterMetricFamily("occasion_summary_cache_hits", "Summary cache hits", value=summary_cache.hits)
+        yield CounterMetricFamily("occasion_summary_cache_misses", "Summary cache misses", value=summary_cache.misses)
+        yield GaugeMetricFamily("occasion_summary_cache_size", "Entries in the in-process summary cache", value=summary_cache.stats()["size"])
+        yield CounterMetricFamily("occasion_llm_rate_limited", "LLM calls rejected with a rate limit", value=llm_rate_limiter.rate_limited)
+        yield GaugeMetricFamily("occasion_llm_rate_scale", "Fraction of the configured LLM rate currently in use", value=llm_rate_limiter.scale)
+
+
+REGISTRY.register(OccasionCollector())
@@ -1,5 +1,5 @@
 import logging
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, Enum, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, Enum, Boolean, DateTime, Index, JSON, text
 from sqlalchemy.orm import relationship
 
 from db.database import Base
@@ -12,17 +12,85 @@ class Occasion(Base):
     __tablename__ = "occasions"
 
     id = Column(Integer, primary_key=True, index=True)
-    created = Column(String, nullable=False)
+    created = Column(DateTime(timezone=True), nullable=False)
     label = Column(String)
     type = Column(String, index=True)
     tone = Column(String)
     email = Column(String)
-    date = Column(String)
+    date = Column(DateTime(timezone=True))
+    utc_offset_minutes = Column(Integer, nullable=True)
     custom_input = Column(String)
     summary = Column(Text, nullable=True)
-    date_processed = Column(String, nullable=True)
+    summary_key = Column(String(64), nullable=True)
+    date_processed = Column(DateTime(timezone=True), nullable=True)
     user_id = Column(Integer, ForeignKey('users.id'), index=True, nullable=False)
     user = relationship("User", back_populates="occasions")
     is_recurring = Column(Boolean, default=False)
+    recurrence_rule = Column(String, nullable=True)
+    next_due_at = Column(DateTime(timezone=True), nullable=True)
     is_draft = Column(Boolean, default=False)
     is_processing = Column(Boolean, nullable=False, default=False)
+    processing_worker_id = Column(String, nullable=True)
+    processing_lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    deliveries = relationship(
+        "OccasionDelivery",
+        back_populates="occasion",
+        cascade="all, delete-orphan",
+        order_by="OccasionDelivery.due_at"
+    )
+
+    __table_args__ = (
+        # Covers the scheduler's due-occasion scan: pending rows only, walked in next-due order
+        Index(
+            "ix_occasions_due",
+            "next_due_at", "is_processing", "processing_lease_expires_at", "id",
+            postgresql_where=text("is_draft IS NOT true AND date_processed IS NULL"),
+            sqlite_where=text("is_draft IS NOT 1 AND date_processed IS NULL"),
+        ),
+    )
+
+
+class OccasionDelivery(Base):
+    __tablename__ = "occasion_deliveries"
+
+    id = Column(Integer, primary_key=True)
+    occasion_id = Column(Integer, ForeignKey('occasions.id', ondelete="CASCADE"), index=True, nullable=False)
+    occasion = relationship("Occasion", back_populates="deliveries")
+    due_at = Column(DateTime(timezone=True), nullable=False)
+    summary = Column(Text, nullable=True)
+    date_processed = Column(DateTime(timezone=True), nullable=False)
+
+
+class OccasionBatch(Base):
+    __tablename__ = "occasion_batches"
+
+    id = Column(Integer, primary_key=True)
+    created = Column(DateTime(timezone=True), nullable=False)
+    batch_id = Column(String, unique=True, nullable=False)
+    status = Column(String, nullable=False, default="submitted")
+    # The lease owner the batch's occasions were claimed under, so any worker can complete them after a restart
+    worker_id = Column(String, nullable=False)
+    occasion_ids = Column(JSON, nullable=False)
+    request_path = Column(String, nullable=True)
+    claimed_by = Column(String, nullable=True)
+    claim_expires_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Covers the scan for batches still waiting on the provider
+        Index(
+            "ix_occasion_batches_submitted",
+            "created",
+            postgresql_where=text("status = 'submitted'"),
+            sqlite_where=text("status = 'submitted'"),
+        ),
+    )
+
+
+class SummaryCacheEntry(Base):
+    __tablename__ = "summary_cache"
+
+    key = Column(String(64), primary_key=True)
+    model = Column(String, nullable=False)
+    summary = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import random
+import time
+
+import openai
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# On a 429 the effective rate is cut by this factor, then recovers a little with every success
+BACKOFF_FACTOR = 0.8
+RECOVERY_STEP = 0.01
+MIN_SCALE = 0.1
+MAX_BACKOFF_SECONDS = 60
+
+TRANSIENT_ERRORS = (openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+
+def estimate_tokens(prompt: str):
+    # Roughly four characters per token, plus the completion we expect back
+    return len(prompt) // 4 + settings.LLM_ESTIMATED_COMPLETION_TOKENS
+
+
+def _retry_after(exc: openai.APIStatusError):
+    headers = exc.response.headers if exc.response is not None else {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+class TokenBucket:
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.base_rate = per_minute / 60
+        self.rate = self.base_rate
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, amount: float, now: float):
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0
+        return (amount - self.available) / self.rate
+
+    def consume(self, amount: float):
+        self.available -= min(amount, self.capacity)
+
+
+class AdaptiveRateLimiter:
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.scale = 1.0
+        self.rate_limited = 0
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int):
+        # The lock keeps waiters in FIFO order so a large request isn't starved by small ones
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                delay = max(
+                    self._blocked_until - now,
+                    self.requests.delay_for(1, now),
+                    self.tokens.delay_for(tokens, now)
+                )
+                if delay <= 0:
+                    self.requests.consume(1)
+                    self.tokens.consume(tokens)
+                    return
+                await asyncio.sleep(delay)
+
+    def on_success(self):
+        if self.scale < 1.0:
+            self._set_scale(min(1.0, self.scale + RECOVERY_STEP))
+
+    def on_rate_limited(self, retry_after: float):
+        self.rate_limited += 1
+        self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        self._set_scale(max(MIN_SCALE, self.scale * BACKOFF_FACTOR))
+        logger.warning(f"LLM rate limited, pausing for {retry_after:.1f}s at {self.scale:.0%} of the configured rate")
+
+    def _set_scale(self, scale: float):
+        self.scale = scale
+        for bucket in (self.requests, self.tokens):
+            bucket.rate = bucket.base_rate * scale
+
+    async def run(self, func, tokens: int):
+        attempt = 0
+        while True:
+            await self.acquire(tokens)
+            try:
+                result = await func()
+                self.on_success()
+                return result
+            except openai.RateLimitError as exc:
+                if attempt >= settings.LLM_RATE_LIMIT_RETRIES:
+                    raise
+                backoff = random.uniform(0, min(MAX_BACKOFF_SECONDS, 2 ** attempt))
+                self.on_rate_limited(_retry_after(exc) or backoff)
+                # Spread retries out so callers released together don't hit the limit together again
+                await asyncio.sleep(random.uniform(0, backoff))
+            except TRANSIENT_ERRORS:
+                if attempt >= settings.LLM_RATE_LIMIT_RETRIES:
+                    raise
+                await asyncio.sleep(random.uniform(0, min(MAX_BACKOFF_SECONDS, 2 ** attempt)))
+            attempt += 1
+
+
+llm_rate_limiter = AdaptiveRateLimiter(
+    requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE
+)
@@ -0,0 +1,58 @@
+import calendar
+
+from datetime import datetime
+from typing import Optional
+
+from occasions.utils import as_local, as_utc
+
+YEARLY = "YEARLY"
+MONTHLY = "MONTHLY"
+DEFAULT_RECURRENCE_RULE = f"FREQ={YEARLY}"
+
+
+def parse_rule(rule: str):
+    # Accepts the RRULE subset we support, e.g. "FREQ=YEARLY" or "FREQ=MONTHLY;INTERVAL=3"
+    parts = {}
+    for part in rule.upper().removeprefix("RRULE:").split(";"):
+        name, _, value = part.strip().partition("=")
+        if name:
+            parts[name] = value
+
+    frequency = parts.pop("FREQ", None)
+    if frequency not in (YEARLY, MONTHLY):
+        raise ValueError("Recurrence rule must have FREQ=YEARLY or FREQ=MONTHLY")
+    try:
+        interval = int(parts.pop("INTERVAL", 1))
+    except ValueError:
+        raise ValueError("Recurrence rule INTERVAL must be a number")
+    if interval < 1:
+        raise ValueError("Recurrence rule INTERVAL must be at least 1")
+    if parts:
+        raise ValueError(f"Unsupported recurrence rule parts: {', '.join(sorted(parts))}")
+    return frequency, interval
+
+
+def _add_months(value: datetime, months: int):
+    # Clamp to the end of shorter months so Feb 29 falls on Feb 28 in common years and returns to Feb 29 after
+    month_index = value.month - 1 + months
+    year = value.year + month_index // 12
+    month = month_index % 12 + 1
+    return value.replace(year=year, month=month, day=min(value.day, calendar.monthrange(year, month)[1]))
+
+
+def next_occurrence(rule: str, start: datetime, after: datetime, offset_minutes: Optional[int] = None):
+    frequency, interval = parse_rule(rule)
+    step = interval * 12 if frequency == YEARLY else interval
+
+    # Months are stepped on the user's calendar, not on UTC's, so clamping lands on the local day they picked
+    start = as_local(start, offset_minutes)
+    after = as_local(after, offset_minutes)
+
+    # Every occurrence is computed from the original date, so clamped days never drift
+    months_elapsed = (after.year - start.year) * 12 + after.month - start.month
+    count = max(0, months_elapsed // step)
+    while True:
+        occurrence = _add_months(start, count * step)
+        if occurrence > after:
+            return as_utc(occurrence)
+        count += 1
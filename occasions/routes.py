@@ -1,12 +1,13 @@
 import logging
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from datetime import datetime, timezone
 
-from db.database import get_db
+from db.database import get_async_db
 from occasions.services import OccasionService
 from occasions.types import OccasionIn, OccasionOut
+from occasions.utils import as_utc
 from users.models import User
 from users.utils import get_current_user
 
@@ -15,9 +16,9 @@ logger = logging.getLogger(__name__)
 
 
 @router.post("/occasions/")
-async def create_occasion(occasion: OccasionIn, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def create_occasion(occasion: OccasionIn, user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     try:
-        OccasionService().create_occasion(db, user=user, **occasion.model_dump())
+        await OccasionService().create_occasion(db, user=user, **occasion.model_dump())
         return {"message": "Occasion created successfully"}
     except ValueError as e:
         logger.error(f"Value error raised while creating the occasion - {e}")
@@ -28,18 +29,18 @@ async def create_occasion(occasion: OccasionIn, user: User = Depends(get_current
 
 
 @router.get("/occasions/", response_model=List[OccasionOut])
-async def get_occasions(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_occasions(user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     try:
-        return OccasionService().get_occasions_for_user(db, user.id)
+        return await OccasionService().get_occasions_for_user(db, user.id)
     except Exception as e:
         logger.error(f"An error occurred while getting the occasions - {e}")
         raise HTTPException(status_code=500, detail="An error occurred while getting the occasions")
 
 
 @router.get("/occasions/{occasion_id}", response_model=OccasionOut)
-async def get_occasion(occasion_id: int, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+async def get_occasion(occasion_id: int, db: AsyncSession = Depends(get_async_db), user: User = Depends(get_current_user)):
     try:
-        return OccasionService().get_occasion(db, occasion_id, user.id)
+        return await OccasionService().get_occasion(db, occasion_id, user.id)
     except ValueError as e:
         logger.error(f"Value error raised while getting the occasion - {e}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -52,22 +53,22 @@ async def get_occasion(occasion_id: int, db: Session = Depends(get_db), user: Us
 async def update_occasion(
     occasion_id: int,
     occasion: OccasionIn,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(get_current_user)
 ):
     try:
         # Get the occasion to check if it's a draft or has a future date
-        existing_occasion = OccasionService().get_occasion(db, occasion_id, user.id)
+        existing_occasion = await OccasionService().get_occasion(db, occasion_id, user.id)
 
         # Check if the occasion is a draft or has a future date
-        if not existing_occasion.is_draft and datetime.fromisoformat(existing_occasion.date) <= datetime.now(timezone.utc):
+        if not existing_occasion.is_draft and as_utc(existing_occasion.next_due_at) <= datetime.now(timezone.utc):
             raise HTTPException(
                 status_code=403,
                 detail="Cannot modify processed occasions"
             )
 
         # If it's a draft or has a future date, proceed with modification
-        OccasionService().update_occasion(db, existing_occasion, **occasion.model_dump())
+        await OccasionService().update_occasion(db, existing_occasion, **occasion.model_dump())
         return {"message": "Occasion updated successfully"}
     except ValueError as e:
         logger.error(f"Value error raised while updating the occasion - {e}")
@@ -86,22 +87,22 @@ async def update_occasion(
 @router.delete("/occasions/{occasion_id}")
 async def delete_occasion(
     occasion_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user: User = Depends(get_current_user)
 ):
     try:
         # Get the occasion to check if it's a draft or has a future date
-        existing_occasion = OccasionService().get_occasion(db, occasion_id, user.id)
+        existing_occasion = await OccasionService().get_occasion(db, occasion_id, user.id)
 
         # Check if the occasion is a draft or has a future date
-        if not existing_occasion.is_draft and datetime.fromisoformat(existing_occasion.date) <= datetime.now(timezone.utc):
+        if not existing_occasion.is_draft and as_utc(existing_occasion.next_due_at) <= datetime.now(timezone.utc):
             raise HTTPException(
                 status_code=403,
                 detail="Cannot delete processed occasions"
             )
 
         # If it's a draft or has a future date, proceed with deletion
-        OccasionService().delete_occasion(db, existing_occasion)
+        await OccasionService().delete_occasion(db, existing_occasion)
         return {"message": "Occasion deleted successfully"}
     except ValueError as e:
         logger.error(f"Value error raised while deleting the occasion - {e}")
@@ -121,10 +122,10 @@ async def delete_occasion(
 async def activate_draft_occasion(
     occasion_id: int,
     user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        activated_occasion = OccasionService().activate_draft_occasion(db, occasion_id, user)
+        activated_occasion = await OccasionService().activate_draft_occasion(db, occasion_id, user)
         return {"message": "Draft occasion activated successfully", "occasion": activated_occasion}
     except ValueError as e:
         logger.error(f"Value error raised while activating draft occasion - {e}")
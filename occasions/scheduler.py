@@ -0,0 +1,95 @@
+import asyncio
+import heapq
+import logging
+import sqlalchemy as sa
+
+from datetime import datetime, timezone
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from occasions.models import Occasion
+from occasions.utils import as_utc
+
+logger = logging.getLogger(__name__)
+
+
+class DueOccasionQueue:
+    def __init__(self):
+        # Min-heap of (due_at, occasion_id). Entries are invalidated lazily against _due_at on pop.
+        self._heap = []
+        self._due_at = {}
+        # Occasions notified since the last refresh, which the refresh query may not see
+        self._notified = {}
+        self._changed = asyncio.Event()
+        self.is_active = False
+
+    async def refresh(self, db: AsyncSession, limit: int, since: datetime):
+        notified, self._notified = self._notified, {}
+        rows = (await db.execute(
+            sa.select(Occasion.id, Occasion.next_due_at).where(
+                sa.and_(
+                    Occasion.is_draft.isnot(True),
+                    Occasion.date_processed.is_(None),
+                    Occasion.next_due_at >= since
+                )
+            ).order_by(Occasion.next_due_at).limit(limit)
+        )).all()
+
+        due_at = {row.id: as_utc(row.next_due_at) for row in rows if row.next_due_at}
+        # An occasion that became due before `since` while the tick ran is outside the query, so keep its notification.
+        # Notifications that arrived during the query are newer than its result.
+        for occasion_id, notified_due_at in notified.items():
+            if notified_due_at < since:
+                due_at.setdefault(occasion_id, notified_due_at)
+        due_at.update(self._notified)
+
+        self._due_at = due_at
+        self._heap = [(due_at, occasion_id) for occasion_id, due_at in self._due_at.items()]
+        heapq.heapify(self._heap)
+        self._changed.set()
+
+    def notify(self, occasion: Occasion):
+        if not self.is_active:
+            return
+
+        if occasion.is_draft or occasion.date_processed or not occasion.next_due_at:
+            self.remove(occasion.id)
+            return
+
+        due_at = as_utc(occasion.next_due_at)
+        self._due_at[occasion.id] = due_at
+        self._notified[occasion.id] = due_at
+        heapq.heappush(self._heap, (due_at, occasion.id))
+        if self._heap[0] == (due_at, occasion.id):
+            self._changed.set()
+
+    def remove(self, occasion_id: int):
+        if not self.is_active:
+            return
+        self._due_at.pop(occasion_id, None)
+        self._notified.pop(occasion_id, None)
+
+    def next_due(self):
+        while self._heap:
+            due_at, occasion_id = self._heap[0]
+            if self._due_at.get(occasion_id) == due_at:
+                return due_at
+            heapq.heappop(self._heap)
+        return None
+
+    async def wait_for_next_due(self, max_sleep: float):
+        while True:
+            timeout = max_sleep
+            next_due = self.next_due()
+            if next_due:
+                timeout = min(max_sleep, (next_due - datetime.now(timezone.utc)).total_seconds())
+            if timeout <= 0:
+                return
+
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                return
+
+
+due_occasion_queue = DueOccasionQueue()
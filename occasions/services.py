@@ -1,158 +1,556 @@
 import asyncio
 import logging
+from collections import Counter
 from datetime import datetime, timezone, timedelta
+from typing import Iterable, List, Optional, Tuple
 
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
+import sqlalchemy as sa
 from sqlalchemy import and_
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from config import get_settings
-from mail.services import MailService
-
-from occasions.constants import LLM_PROMPT
-from occasions.models import Occasion
+from db.database import AsyncSessionLocal
+from mail.services import OutboxService
+
+from occasions.cache import summary_cache
+from occasions.llm import SUMMARY_PROMPT, get_summary_chain, summary_inputs
+from occasions.metrics import DELIVERY_LAG, LLM_LATENCY, PROCESSING_ERRORS
+from occasions.models import Occasion, OccasionBatch, OccasionDelivery
+from occasions.rate_limit import estimate_tokens, llm_rate_limiter
+from occasions.recurrence import DEFAULT_RECURRENCE_RULE, next_occurrence, parse_rule
+from occasions.scheduler import due_occasion_queue
 from occasions.types import OccasionTone, OccasionType
-from users.models import User
+from occasions.utils import as_utc, utc_offset_minutes
+from users.cache import user_cache
+from users.models import Credits, User
 
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# How many of the most overdue rows are considered per claimed row when sharing a page fairly between users
+FAIR_SHARE_CANDIDATE_FACTOR = 10
+
 
 class OccasionService:
-    def create_occasion(self, db: Session, user: User, **kwargs):
+    async def create_occasion(self, db: AsyncSession, user: User, **kwargs):
         try:
+            # The authenticated user may come from the user cache, so check against the current balance
+            if user.credits:
+                await db.refresh(user.credits)
             if not (hasattr(user, 'credits') and user.credits.credits):
                 raise ValueError("User has no credits to create an occasion")
 
-            kwargs["date"] = kwargs["date"].isoformat() if kwargs.get("date") else None
-            kwargs["created"] = datetime.now(timezone.utc).isoformat()
+            # Keep the user's offset so the date can be shown and summarised as they entered it
+            kwargs["utc_offset_minutes"] = utc_offset_minutes(kwargs["date"]) if kwargs.get("date") else None
+            kwargs["date"] = as_utc(kwargs["date"]) if kwargs.get("date") else None
+            kwargs["created"] = datetime.now(timezone.utc)
             kwargs["user_id"] = user.id
             kwargs["email"] = user.email
             occasion = Occasion(**kwargs)
             self._validate_occasion(db, occasion)
+            self._schedule_occasion(occasion, after=None)
             db.add(occasion)
 
             user.credits.credits -= 1
-            db.commit()
-            db.refresh(occasion)
+            await db.commit()
+            await db.refresh(occasion)
+            due_occasion_queue.notify(occasion)
 
             return occasion
         except (ValueError, Exception):
-            db.rollback()
+            await db.rollback()
             raise
 
-    def get_occasions_for_user(self, db: Session, user_id: int):
-        return db.query(Occasion).filter(Occasion.user_id == user_id).all()
+    async def get_occasions_for_user(self, db: AsyncSession, user_id: int):
+        return (await db.scalars(
+            sa.select(Occasion).options(selectinload(Occasion.deliveries)).where(Occasion.user_id == user_id)
+        )).all()
 
-    def get_occasion(self, db: Session, occasion_id: int, user_id: int):
-        occasion = db.query(Occasion).filter(
+    async def get_occasion(self, db: AsyncSession, occasion_id: int, user_id: int):
+        occasion = await db.scalar(sa.select(Occasion).options(selectinload(Occasion.deliveries)).where(
             Occasion.id == occasion_id,
             Occasion.user_id == user_id
-        ).first()
+        ))
 
         if not occasion:
             raise ValueError("Occasion not found")
         return occasion
 
-    def update_occasion(self, db: Session, occasion: Occasion, **kwargs):
+    async def update_occasion(self, db: AsyncSession, occasion: Occasion, **kwargs):
         for key, value in kwargs.items():
             if key == "date":
-                value = value.isoformat() if value else None
+                occasion.utc_offset_minutes = utc_offset_minutes(value) if value else None
+                value = as_utc(value) if value else None
             setattr(occasion, key, value)
+        # Any pre-generated summary was written for the old inputs
+        occasion.summary = None
+        occasion.summary_key = None
         self._validate_occasion(db, occasion)
-        db.commit()
-        db.refresh(occasion)
+        self._schedule_occasion(occasion, after=datetime.now(timezone.utc))
+        await db.commit()
+        await db.refresh(occasion)
+        due_occasion_queue.notify(occasion)
         return occasion
 
-    def delete_occasion(self, db: Session, occasion: Occasion):
-        occasion.user.add_credits(1)
-        db.delete(occasion)
-        db.commit()
+    async def delete_occasion(self, db: AsyncSession, occasion: Occasion):
+        user = await db.get(User, occasion.user_id, options=[joinedload(User.credits)])
+        user.add_credits(1)
+        await db.delete(occasion)
+        await db.commit()
+        due_occasion_queue.remove(occasion.id)
         return {"message": "Occasion deleted successfully"}
 
-    async def process_occasion(self, db: Session, occasion: Occasion):
+    async def claim_due_occasions(
+        self,
+        db: AsyncSession,
+        worker_id: str,
+        limit: Optional[int] = None,
+        lease_seconds: Optional[int] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+        per_user_limit: Optional[int] = None,
+        exclude_user_ids: Optional[Iterable[int]] = None
+    ):
+        now = datetime.now(timezone.utc)
+        lease_expires_at = now + timedelta(seconds=lease_seconds or settings.OCCASION_LEASE_SECONDS)
+        claimable = and_(
+            Occasion.is_draft.isnot(True),
+            Occasion.date_processed.is_(None),
+            Occasion.next_due_at < now,
+            sa.or_(
+                Occasion.is_processing.is_(False),
+                Occasion.processing_lease_expires_at.is_(None),
+                Occasion.processing_lease_expires_at < now
+            )
+        )
+        if after:
+            # Keyset cursor: resume strictly after the last (next_due_at, id) already claimed this tick
+            after_due_at, after_id = after
+            claimable = and_(
+                claimable,
+                sa.or_(
+                    Occasion.next_due_at > after_due_at,
+                    and_(Occasion.next_due_at == after_due_at, Occasion.id > after_id)
+                )
+            )
+        if exclude_user_ids:
+            claimable = and_(claimable, Occasion.user_id.notin_(list(exclude_user_ids)))
+        if per_user_limit and limit:
+            claimable = and_(claimable, Occasion.id.in_(self._fair_share_candidates(claimable, limit, per_user_limit)))
+        claim = {
+            Occasion.is_processing: True,
+            Occasion.processing_worker_id: worker_id,
+            Occasion.processing_lease_expires_at: lease_expires_at
+        }
+
+        try:
+            if db.get_bind().dialect.name == 'postgresql':
+                query = sa.select(Occasion.id, Occasion.next_due_at, Occasion.user_id).where(claimable).order_by(
+                    Occasion.next_due_at, Occasion.id
+                ).with_for_update(skip_locked=True)
+                if limit:
+                    query = query.limit(limit)
+                claimed = (await db.execute(query)).all()
+                if claimed:
+                    await db.execute(
+                        sa.update(Occasion).where(Occasion.id.in_([row.id for row in claimed])).values(claim),
+                        execution_options={"synchronize_session": False}
+                    )
+            else:
+                # SQLite serialises writers, so a single conditional UPDATE is an atomic claim
+                candidates = sa.select(Occasion.id).where(claimable).order_by(Occasion.next_due_at, Occasion.id)
+                if limit:
+                    candidates = candidates.limit(limit)
+                await db.execute(
+                    sa.update(Occasion).where(Occasion.id.in_(candidates)).values(claim),
+                    execution_options={"synchronize_session": False}
+                )
+                claimed = (await db.execute(
+                    sa.select(Occasion.id, Occasion.next_due_at, Occasion.user_id).where(
+                        Occasion.processing_worker_id == worker_id,
+                        Occasion.processing_lease_expires_at == lease_expires_at
+                    ).order_by(Occasion.next_due_at, Occasion.id)
+                )).all()
+            await db.commit()
+            return claimed
+        except Exception:
+            await db.rollback()
+            raise
+
+    def _fair_share_candidates(self, claimable, limit: int, per_user_limit: int):
+        # Rank only a bounded window of the most overdue rows so the window function never scans the whole backlog
+        candidates = sa.select(Occasion.id, Occasion.user_id, Occasion.next_due_at).where(claimable).order_by(
+            Occasion.next_due_at, Occasion.id
+        ).limit(limit * FAIR_SHARE_CANDIDATE_FACTOR).subquery()
+        ranked = sa.select(
+            candidates.c.id,
+            sa.func.row_number().over(
+                partition_by=candidates.c.user_id,
+                order_by=(candidates.c.next_due_at, candidates.c.id)
+            ).label("user_rank")
+        ).subquery()
+        return sa.select(ranked.c.id).where(ranked.c.user_rank <= per_user_limit)
+
+    async def get_claimed_occasions(self, db: AsyncSession, worker_id: str, batch_size: int):
+        return await db.stream_scalars(
+            sa.select(Occasion).where(
+                Occasion.processing_worker_id == worker_id,
+                Occasion.is_processing.is_(True)
+            ).order_by(Occasion.next_due_at, Occasion.id).execution_options(yield_per=batch_size)
+        )
+
+    async def release_occasions(self, db: AsyncSession, occasion_ids: List[int], worker_id: str):
+        await db.execute(
+            sa.update(Occasion).where(
+                Occasion.id.in_(occasion_ids),
+                Occasion.processing_worker_id == worker_id
+            ).values({
+                Occasion.is_processing: False,
+                Occasion.processing_worker_id: None,
+                Occasion.processing_lease_expires_at: None
+            }),
+            execution_options={"synchronize_session": False}
+        )
+        await db.commit()
+
+    async def renew_leases(self, db: AsyncSession, occasion_ids: List[int], worker_id: str, lease_seconds: Optional[int] = None):
+        lease_expires_at = datetime.now(timezone.utc) + timedelta(seconds=lease_seconds or settings.OCCASION_LEASE_SECONDS)
+        result = await db.execute(
+            sa.update(Occasion).where(
+                Occasion.id.in_(occasion_ids),
+                Occasion.processing_worker_id == worker_id,
+                Occasion.is_processing.is_(True)
+            ).values({Occasion.processing_lease_expires_at: lease_expires_at}),
+            execution_options={"synchronize_session": False}
+        )
+        await db.commit()
+        return result.rowcount
+
+    async def record_batch(
+        self,
+        db: AsyncSession,
+        batch_id: str,
+        worker_id: str,
+        occasion_ids: List[int],
+        request_path: Optional[str] = None
+    ):
+        batch = OccasionBatch(
+            created=datetime.now(timezone.utc),
+            batch_id=batch_id,
+            status="submitted",
+            worker_id=worker_id,
+            occasion_ids=occasion_ids,
+            request_path=request_path
+        )
+        db.add(batch)
+        await db.commit()
+        return batch
+
+    async def claim_submitted_batches(self, db: AsyncSession, worker_id: str, lease_seconds: Optional[int] = None):
+        now = datetime.now(timezone.utc)
+        claimable = and_(
+            OccasionBatch.status == "submitted",
+            sa.or_(OccasionBatch.claim_expires_at.is_(None), OccasionBatch.claim_expires_at < now)
+        )
+        batches = (await db.scalars(sa.select(OccasionBatch).where(claimable).order_by(OccasionBatch.created))).all()
+
+        # Another worker may be polling the same batch; only the one whose update lands collects it
+        claimed = []
+        for batch in batches:
+            result = await db.execute(
+                sa.update(OccasionBatch).where(OccasionBatch.id == batch.id, claimable).values({
+                    OccasionBatch.claimed_by: worker_id,
+                    OccasionBatch.claim_expires_at: now + timedelta(seconds=lease_seconds or settings.OCCASION_LEASE_SECONDS)
+                }),
+                execution_options={"synchronize_session": False}
+            )
+            if result.rowcount == 1:
+                claimed.append(batch)
+        await db.commit()
+        return claimed
+
+    async def release_batch(self, db: AsyncSession, batch: OccasionBatch, worker_id: str):
+        await db.execute(
+            sa.update(OccasionBatch).where(
+                OccasionBatch.id == batch.id,
+                OccasionBatch.claimed_by == worker_id
+            ).values({OccasionBatch.claimed_by: None, OccasionBatch.claim_expires_at: None}),
+            execution_options={"synchronize_session": False}
+        )
+        await db.commit()
+
+    async def finish_batch(self, db: AsyncSession, batch: OccasionBatch, status: str):
+        # Anything the batch didn't complete goes back to be claimed again
+        await db.execute(
+            sa.update(Occasion).where(Occasion.processing_worker_id == batch.worker_id).values({
+                Occasion.is_processing: False,
+                Occasion.processing_worker_id: None,
+                Occasion.processing_lease_expires_at: None
+            }),
+            execution_options={"synchronize_session": False}
+        )
+        await db.execute(
+            sa.update(OccasionBatch).where(OccasionBatch.id == batch.id).values({
+                OccasionBatch.status: status,
+                OccasionBatch.claimed_by: None,
+                OccasionBatch.claim_expires_at: None,
+                OccasionBatch.finished_at: datetime.now(timezone.utc)
+            }),
+            execution_options={"synchronize_session": False}
+        )
+        await db.commit()
+
+    async def summarise_occasion(self, occasion: Occasion):
         try:
             if occasion.date_processed:
                 logger.warning(f"Occasion {occasion.id} has already been processed")
-                return
+                return None
 
             if occasion.is_draft:
                 logger.warning(f"Occasion {occasion.id} is in draft state and cannot be processed")
-                return
+                return None
 
             logger.info(f"Processing occasion {occasion.id}")
-            summary = await self._generate_summary(occasion)
-
-            occasion.summary = summary
-            occasion.date_processed = datetime.now(timezone.utc).isoformat()
-            db.commit()
-
-            asyncio.create_task(self._send_summary(occasion.user.email, occasion.label, summary))
+            if occasion.summary and occasion.summary_key == self._summary_key(occasion):
+                logger.info(f"Using pre-generated summary for occasion {occasion.id}")
+                return occasion.summary
+            return await self._generate_summary(occasion)
+        except Exception as exc:
+            PROCESSING_ERRORS.labels(stage="generate").inc()
+            logger.error(f"Error processing occasion {occasion.id}. {exc}")
+            return None
+
+    async def commit_occasion(
+        self,
+        occasion: Occasion,
+        summary: str,
+        worker_id: str,
+        commit_turn: Optional[asyncio.Event] = None,
+        recurring: Optional[List[dict]] = None
+    ):
+        try:
+            # When processed concurrently, wait for the preceding occasion to commit so results land in order
+            if commit_turn:
+                await commit_turn.wait()
+
+            # The occasion was read in a session that is already closed, so no connection is held through the LLM call
+            db = AsyncSessionLocal()
+            try:
+                return await self.complete_occasion(db, occasion, summary, worker_id, recurring)
+            finally:
+                await db.close()
+        except Exception as exc:
+            PROCESSING_ERRORS.labels(stage="commit").inc()
+            logger.error(f"Error processing occasion {occasion.id}. {exc}")
+            return False
+
+    async def get_occasion_ids_to_pregenerate(self, db: AsyncSession, window: timedelta, limit: int):
+        now = datetime.now(timezone.utc)
+        return (await db.scalars(
+            sa.select(Occasion.id).where(
+                and_(
+                    Occasion.is_draft.isnot(True),
+                    Occasion.date_processed.is_(None),
+                    Occasion.summary.is_(None),
+                    Occasion.next_due_at >= now,
+                    Occasion.next_due_at < now + window
+                )
+            ).order_by(Occasion.next_due_at).limit(limit)
+        )).all()
 
-            if occasion.is_recurring:
-                self._recreate_recurring_occasion(db, occasion)
+    async def pregenerate_summary(self, occasion: Occasion):
+        try:
+            summary_key = self._summary_key(occasion)
+            summary = await self._generate_summary(occasion)
 
-            logger.info(f"Occasion {occasion.id} processed successfully")
+            # Don't overwrite an occasion that was processed while the summary was being generated
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    sa.update(Occasion).where(
+                        Occasion.id == occasion.id,
+                        Occasion.date_processed.is_(None),
+                        Occasion.next_due_at == occasion.next_due_at
+                    ).values({Occasion.summary: summary, Occasion.summary_key: summary_key}),
+                    execution_options={"synchronize_session": False}
+                )
+                await db.commit()
+            logger.info(f"Pre-generated summary for occasion {occasion.id}")
         except Exception as exc:
-            logger.error(f"Error processing occasion {occasion.id}. {exc}")
-            db.rollback()
+            PROCESSING_ERRORS.labels(stage="pregenerate").inc()
+            logger.error(f"Error pre-generating summary for occasion {occasion.id}. {exc}")
+
+    async def complete_occasion(
+        self,
+        db: AsyncSession,
+        occasion: Occasion,
+        summary: str,
+        worker_id: str,
+        recurring: Optional[List[dict]] = None
+    ):
+        now = datetime.now(timezone.utc)
+        due_at = as_utc(occasion.next_due_at or occasion.date)
+        if occasion.recurrence_rule:
+            # Recurring occasions keep a single row: the result goes to the delivery history and the row moves on.
+            # The next occurrence starts as a draft until charge_recurring_occasions takes its credit and activates it.
+            values = {
+                "next_due_at": next_occurrence(
+                    occasion.recurrence_rule,
+                    occasion.date,
+                    max(now, due_at),
+                    occasion.utc_offset_minutes
+                ),
+                "summary": None,
+                "summary_key": None,
+                "is_draft": True
+            }
+        else:
+            values = {"summary": summary, "date_processed": now}
+
+        # Only a worker whose lease is still live may complete the occasion. Once it lapses another worker can claim
+        # the occasion, and completing it here as well would deliver it twice. A recurring occasion that has already
+        # moved on to its next occurrence isn't completed again either.
+        result = await db.execute(
+            sa.update(Occasion).where(
+                Occasion.id == occasion.id,
+                Occasion.date_processed.is_(None),
+                Occasion.next_due_at == occasion.next_due_at,
+                Occasion.processing_worker_id == worker_id,
+                Occasion.processing_lease_expires_at > now
+            ).values(values),
+            execution_options={"synchronize_session": False}
+        )
+        if result.rowcount != 1:
+            PROCESSING_ERRORS.labels(stage="lease").inc()
+            logger.warning(f"Occasion {occasion.id} was already completed or its lease was lost")
+            await db.rollback()
+            return False
+
+        if occasion.recurrence_rule:
+            db.add(OccasionDelivery(occasion_id=occasion.id, due_at=due_at, summary=summary, date_processed=now))
+        # Queued in the same transaction, so a committed summary is never left without its email.
+        # Callers load the user along with the occasion.
+        OutboxService().enqueue_summary_email(
+            db,
+            occasion.user.email,
+            occasion.label,
+            summary,
+            locale=occasion.user.locale
+        )
+        await db.commit()
+        for key, value in values.items():
+            set_committed_value(occasion, key, value)
+        DELIVERY_LAG.observe(max(0, (now - due_at).total_seconds()))
+
+        if occasion.recurrence_rule:
+            # Callers processing many occasions collect the next occurrences and charge them in bulk afterwards
+            next_recurrence = {
+                "occasion_id": occasion.id,
+                "user_id": occasion.user_id,
+                "next_due_at": as_utc(occasion.next_due_at)
+            }
+            if recurring is not None:
+                recurring.append(next_recurrence)
+            else:
+                await self.charge_recurring_occasions(db, [next_recurrence])
+
+        logger.info(f"Occasion {occasion.id} processed successfully")
+        return True
+
+    async def charge_recurring_occasions(self, db: AsyncSession, recurrences: List[dict]):
+        if not recurrences:
+            return
 
-    def _recreate_recurring_occasion(self, db: Session, original_occasion: Occasion):
         try:
-            user = db.query(User).get(original_occasion.user_id)
-
-            new_occasion = Occasion(
-                    label=original_occasion.label,
-                    type=original_occasion.type,
-                    tone=original_occasion.tone,
-                    email=original_occasion.email,
-                    date=(datetime.fromisoformat(original_occasion.date) + timedelta(days=365)).isoformat(),
-                    custom_input=original_occasion.custom_input,
-                    user_id=original_occasion.user_id,
-                    is_recurring=original_occasion.is_recurring,
-                    created=datetime.now(timezone.utc).isoformat(),
-                    is_draft=True
+            # Only occasions still waiting as drafts are charged, so one the user activated meanwhile isn't charged twice
+            drafts_query = sa.select(Occasion.id, Occasion.user_id).where(
+                Occasion.id.in_([recurrence["occasion_id"] for recurrence in recurrences]),
+                Occasion.is_draft.is_(True)
+            ).order_by(Occasion.next_due_at, Occasion.id)
+            user_ids = {recurrence["user_id"] for recurrence in recurrences}
+            credits_query = sa.select(Credits.user_id, Credits.credits).where(Credits.user_id.in_(user_ids))
+            if db.get_bind().dialect.name == 'postgresql':
+                drafts_query = drafts_query.with_for_update()
+                credits_query = credits_query.with_for_update()
+            drafts = (await db.execute(drafts_query)).all()
+            available = {row.user_id: row.credits or 0 for row in await db.execute(credits_query)}
+
+            # Each next occurrence costs a credit; without one it stays a draft until the user activates it
+            used = Counter()
+            activated_ids = []
+            draft_ids = []
+            for draft in drafts:
+                if available.get(draft.user_id, 0) - used[draft.user_id] <= 0:
+                    draft_ids.append(draft.id)
+                else:
+                    used[draft.user_id] += 1
+                    activated_ids.append(draft.id)
+
+            # Activation and its charge commit together, so an occasion is never scheduled without being paid for
+            if activated_ids:
+                await db.execute(
+                    sa.update(Occasion).where(Occasion.id.in_(activated_ids)).values({Occasion.is_draft: False}),
+                    execution_options={"synchronize_session": False}
+                )
+            if used:
+                credits_table = Credits.__table__
+                await db.execute(
+                    sa.update(credits_table).where(credits_table.c.user_id == sa.bindparam("credits_user_id")).values(
+                        credits=credits_table.c.credits - sa.bindparam("used")
+                    ),
+                    [{"credits_user_id": user_id, "used": count} for user_id, count in used.items()]
                 )
-            if user.credits.credits > 0:
-                logger.info(f"User {user.id} has enough credits to create a new occasion for recurring event")
-                new_occasion.is_draft = False
-                user.credits.credits -= 1
-
-            db.add(new_occasion)
-            db.commit()
-            logger.info(f"Created {'draft' if new_occasion.is_draft else 'recurring'} occasion {new_occasion.id} for original occasion {original_occasion.id}")
+            await db.commit()
+            # Bulk updates bypass the session, so drop the cached balances explicitly
+            user_cache.invalidate(used.keys())
+            for occasion_id in draft_ids:
+                due_occasion_queue.remove(occasion_id)
+            logger.info(
+                f"Scheduled {sum(used.values())} recurring occasions and left {len(draft_ids)} as drafts "
+                f"out of {len(recurrences)} recurrences"
+            )
         except Exception as exc:
-            logger.error(f"Error creating recurring occasion for {original_occasion.id}. {exc}")
-            db.rollback()
+            PROCESSING_ERRORS.labels(stage="recurring").inc()
+            occasion_ids = [recurrence["occasion_id"] for recurrence in recurrences]
+            logger.error(f"Error charging recurring occasions {occasion_ids}, leaving them as drafts. {exc}")
+            await db.rollback()
 
-    async def _send_summary(self, recipient_email, occasion_label, summary):
-        subject = f"Occasion Alerts - Summary for {occasion_label}"
-        MailService().send_email(recipient_email, subject, body=summary)
+    def _summary_key(self, occasion: Occasion):
+        return summary_cache.key(SUMMARY_PROMPT.format(**summary_inputs(occasion)), settings.LLM_MODEL)
 
     async def _generate_summary(self, occasion: Occasion):
-        model = ChatOpenAI(model='gpt-4o-mini')
-        prompt = PromptTemplate(
-            input_variables=["occasion_label" "occasion_date", "occasion_tone", "occasion_type", "custom_input"],
-            template=LLM_PROMPT
+        inputs = summary_inputs(occasion)
+        prompt = SUMMARY_PROMPT.format(**inputs)
+        return await summary_cache.get_or_generate(
+            summary_cache.key(prompt, settings.LLM_MODEL),
+            settings.LLM_MODEL,
+            lambda: llm_rate_limiter.run(lambda: self._invoke_summary_chain(inputs), estimate_tokens(prompt))
         )
-        output_parser = StrOutputParser()
-
-        chain = prompt | model | output_parser
 
-        return await chain.ainvoke({
-            "occasion_label": occasion.label,
-            "occasion_date": occasion.date,
-            "occasion_type": occasion.type,
-            "occasion_tone": occasion.tone,
-            "custom_input": occasion.custom_input
-        })
-
-    def _validate_occasion(self, db: Session, occasion: Occasion):
+    async def _invoke_summary_chain(self, inputs: dict):
+        with LLM_LATENCY.time():
+            return await get_summary_chain().ainvoke(inputs)
+
+    def _schedule_occasion(self, occasion: Occasion, after: Optional[datetime]):
+        if occasion.is_recurring and not occasion.recurrence_rule:
+            occasion.recurrence_rule = DEFAULT_RECURRENCE_RULE
+        occasion.is_recurring = bool(occasion.recurrence_rule)
+
+        occasion.next_due_at = occasion.date
+        # An edited recurring occasion picks up at its next occurrence instead of re-sending past ones
+        if occasion.recurrence_rule and occasion.date and after and as_utc(occasion.date) <= after:
+            occasion.next_due_at = next_occurrence(
+                occasion.recurrence_rule,
+                occasion.date,
+                after,
+                occasion.utc_offset_minutes
+            )
+
+    def _validate_occasion(self, db: AsyncSession, occasion: Occasion):
         self._validate_occasion_tone(occasion)
         self._validate_occasion_type(occasion)
+        self._validate_recurrence_rule(occasion)
 
     def _validate_occasion_tone(self, occasion: Occasion):
         for tone in OccasionTone:
@@ -166,18 +564,25 @@ class OccasionService:
                 return
         raise ValueError("Invalid occasion type")
 
-    def activate_draft_occasion(self, db: Session, occasion_id: int, user: User):
-        occasion = db.query(Occasion).get(occasion_id)
+    def _validate_recurrence_rule(self, occasion: Occasion):
+        if occasion.recurrence_rule:
+            parse_rule(occasion.recurrence_rule)
+
+    async def activate_draft_occasion(self, db: AsyncSession, occasion_id: int, user: User):
+        occasion = await db.get(Occasion, occasion_id)
         if not occasion or occasion.user_id != user.id:
             raise ValueError("Occasion not found or doesn't belong to the user")
 
         if not occasion.is_draft:
             raise ValueError("Occasion is not in draft state")
 
-        if user.credits.credits <= 0:
+        if user.credits:
+            await db.refresh(user.credits)
+        if not user.credits or user.credits.credits <= 0:
             raise ValueError("Insufficient credits to activate the occasion")
 
         occasion.is_draft = False
         user.credits.credits -= 1
-        db.commit()
+        await db.commit()
+        due_occasion_queue.notify(occasion)
         return occasion
@@ -1,58 +1,390 @@
 import asyncio
 import logging
-import sqlalchemy as sa
+import uuid
 
-from datetime import datetime, timezone
+from collections import Counter
+from datetime import datetime, timezone, timedelta
 from fastapi import FastAPI
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from typing import List, Optional
 
-from db.database import get_db
-from occasions.models import Occasion
+from config import get_settings
+from db.database import AsyncSessionLocal
+from occasions.batch import get_batch_provider, read_batch_results, remove_batch_files, write_batch_requests
+from occasions.cache import summary_cache
+from occasions.exceptions import BatchFailedException
+from occasions.metrics import PROCESSING_ERRORS, TICK_BATCH_SIZE, TICK_DURATION
+from occasions.models import Occasion, OccasionBatch
+from occasions.scheduler import due_occasion_queue
 from occasions.services import OccasionService
+from occasions.utils import as_utc
+from tasks.utils import WORKER_ID, repeat_func, wait_or_stop
 
 app = FastAPI()
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
+async def process_ocassions(db: AsyncSession, worker_id: str = WORKER_ID):
+    with TICK_DURATION.time():
+        return await _process_ocassions(db, worker_id)
 
-async def repeat_func(seconds: int, func):
+
+async def _process_ocassions(db: AsyncSession, worker_id: str):
+    service = OccasionService()
+    semaphore = asyncio.Semaphore(max(1, settings.OCCASION_PROCESSING_CONCURRENCY))
+    max_per_tick = settings.OCCASION_MAX_PER_TICK
+    per_user_cap = settings.OCCASION_MAX_PER_USER_PER_TICK
+    cursor = None
+    claimed_count = 0
+    user_counts = Counter()
+    capped_user_ids = set()
+    completed_count = 0
+    # Set when due occasions were left for a later tick: over the tick's cap, or over a user's share
+    left_backlog = False
+
+    # Claim and process the backlog a page at a time, most overdue first, so memory stays flat
     while True:
-        await func()
-        await asyncio.sleep(seconds)
+        limit = settings.OCCASION_CLAIM_PAGE_SIZE
+        if max_per_tick:
+            limit = min(limit, max_per_tick - claimed_count)
+        if limit <= 0:
+            left_backlog = True
+            break
 
+        try:
+            page = await service.claim_due_occasions(
+                db,
+                worker_id,
+                limit=limit,
+                after=cursor,
+                per_user_limit=per_user_cap or None,
+                exclude_user_ids=capped_user_ids
+            )
+        except Exception:
+            PROCESSING_ERRORS.labels(stage="claim").inc()
+            raise
+        if not page:
+            break
+        cursor = (page[-1].next_due_at, page[-1].id)
 
-async def process_ocassions(db: Session):
-    service = OccasionService()
-    occasions = db.query(Occasion).filter(
-        sa.and_(
-            sa.or_(Occasion.is_draft.is_(False), Occasion.is_draft.is_(None)),
-            Occasion.date_processed.is_(None),
-            Occasion.is_processing.is_(False),
-            Occasion.date < datetime.now(timezone.utc).isoformat()
+        # Keep each user within their share of the tick; anything over it goes back for the next tick
+        occasion_ids = []
+        over_quota_ids = []
+        for row in page:
+            if per_user_cap and user_counts[row.user_id] >= per_user_cap:
+                over_quota_ids.append(row.id)
+                continue
+            user_counts[row.user_id] += 1
+            occasion_ids.append(row.id)
+        if over_quota_ids:
+            await service.release_occasions(db, over_quota_ids, worker_id)
+            left_backlog = True
+        if per_user_cap:
+            capped_user_ids = {user_id for user_id, count in user_counts.items() if count >= per_user_cap}
+            # Their remaining occasions are never claimed this tick
+            left_backlog = left_backlog or bool(capped_user_ids)
+
+        claimed_count += len(occasion_ids)
+        renewer = asyncio.create_task(renew_leases(service, occasion_ids, worker_id))
+        try:
+            completed_count += await process_page(service, occasion_ids, worker_id, semaphore)
+        finally:
+            renewer.cancel()
+
+    TICK_BATCH_SIZE.observe(claimed_count)
+
+    if settings.OCCASION_PREGENERATE_WINDOW_SECONDS > 0:
+        await pregenerate_summaries(db)
+    # A tick that completed nothing would only retry the same failures, so that backlog waits for the next tick
+    return left_backlog and completed_count > 0
+
+
+async def renew_leases(service: OccasionService, occasion_ids: List[int], worker_id: str):
+    # A slow page would otherwise outlive its leases and let another worker claim and deliver the same occasions
+    interval = max(1, settings.OCCASION_LEASE_SECONDS / 3)
+    while True:
+        await asyncio.sleep(interval)
+        db = AsyncSessionLocal()
+        try:
+            renewed = await service.renew_leases(db, occasion_ids, worker_id)
+            logger.info(f"Renewed leases on {renewed} occasions")
+        except Exception as e:
+            PROCESSING_ERRORS.labels(stage="renew").inc()
+            logger.error(f"Error renewing occasion leases: {str(e)}")
+            await db.rollback()
+        finally:
+            await db.close()
+
+
+async def process_page(service: OccasionService, occasion_ids: List[int], worker_id: str, semaphore: asyncio.Semaphore):
+    # Process occasions concurrently, each in its own session, committing in due order
+    previous_commit = None
+    workers = []
+    recurring = []
+    for occasion_id in occasion_ids:
+        commit = asyncio.Event()
+        workers.append(
+            process_occasion_isolated(service, occasion_id, worker_id, semaphore, previous_commit, commit, recurring)
         )
-    ).all()
+        previous_commit = commit
+    completed = await asyncio.gather(*workers)
 
-    # Mark occasions as processing
-    for occasion in occasions:
-        occasion.is_processing = True
-    db.commit()
+    # Next occurrences of recurring occasions are charged together, with one credit update per user
+    db = AsyncSessionLocal()
+    try:
+        await service.charge_recurring_occasions(db, recurring)
+    finally:
+        await db.close()
+    return sum(completed)
 
-    # Process occasions
-    for occasion in occasions:
+
+async def process_occasion_isolated(
+    service: OccasionService,
+    occasion_id: int,
+    worker_id: str,
+    semaphore: asyncio.Semaphore,
+    previous_commit: Optional[asyncio.Event],
+    commit: asyncio.Event,
+    recurring: List[dict]
+):
+    completed = False
+    try:
+        # Only loading and generating take a slot. Waiting for the commit turn doesn't, so one slow LLM call holds up
+        # the commits behind it but not the generation of the rest of the page.
+        async with semaphore:
+            occasion = await load_occasion(occasion_id)
+            summary = await service.summarise_occasion(occasion) if occasion else None
+        if summary is not None:
+            completed = await service.commit_occasion(
+                occasion,
+                summary,
+                worker_id,
+                commit_turn=previous_commit,
+                recurring=recurring
+            )
+    except Exception as e:
+        PROCESSING_ERRORS.labels(stage="process").inc()
+        logger.error(f"Error processing occasion {occasion_id}: {str(e)}")
+    finally:
+        db = AsyncSessionLocal()
         try:
-            await service.process_occasion(db, occasion)
+            await service.release_occasions(db, [occasion_id], worker_id)
         except Exception as e:
-            logger.error(f"Error processing occasion {occasion.id}: {str(e)}")
+            PROCESSING_ERRORS.labels(stage="release").inc()
+            logger.error(f"Error releasing occasion {occasion_id}: {str(e)}")
+            await db.rollback()
         finally:
-            occasion.is_processing = False
-            db.commit()
+            await db.close()
+            commit.set()
+    return completed
+
+
+async def load_occasion(occasion_id: int):
+    # A short-lived session: the connection goes back to the pool, shared with the web routes, before the LLM call
+    db = AsyncSessionLocal()
+    try:
+        return await db.get(Occasion, occasion_id, options=[joinedload(Occasion.user)])
+    finally:
+        await db.close()
+
+
+async def pregenerate_summaries(db: AsyncSession):
+    service = OccasionService()
+    occasion_ids = await service.get_occasion_ids_to_pregenerate(
+        db,
+        timedelta(seconds=settings.OCCASION_PREGENERATE_WINDOW_SECONDS),
+        settings.OCCASION_PREGENERATE_BATCH_SIZE
+    )
+    await db.commit()
+
+    semaphore = asyncio.Semaphore(max(1, settings.OCCASION_PROCESSING_CONCURRENCY))
+    await asyncio.gather(*(pregenerate_summary_isolated(service, occasion_id, semaphore) for occasion_id in occasion_ids))
+
+
+async def pregenerate_summary_isolated(service: OccasionService, occasion_id: int, semaphore: asyncio.Semaphore):
+    async with semaphore:
+        occasion = await load_occasion(occasion_id)
+        if occasion:
+            await service.pregenerate_summary(occasion)
+
+
+async def process_ocassions_batch(db: AsyncSession, worker_id: str = WORKER_ID):
+    service = OccasionService()
+    provider = get_batch_provider()
+    # Batches outlive the tick that submitted them, and the process too, so every tick first collects finished ones
+    for batch in await service.claim_submitted_batches(db, worker_id):
+        await collect_batch(db, service, provider, batch, worker_id)
+    await submit_batch(db, service, provider, worker_id)
+
+
+async def submit_batch(db: AsyncSession, service: OccasionService, provider, worker_id: str):
+    # Each batch claims its occasions under a lease owner of its own, which tells them apart from other outstanding
+    # batches and lets whichever worker collects the batch complete them
+    lease_owner = f"{worker_id}:{uuid.uuid4().hex[:8]}"
+    claimed = await service.claim_due_occasions(
+        db,
+        lease_owner,
+        limit=settings.OCCASION_MAX_PER_TICK or None,
+        lease_seconds=settings.OCCASION_BATCH_LEASE_SECONDS
+    )
+    TICK_BATCH_SIZE.observe(len(claimed))
+    if not claimed:
+        return
+    occasion_ids = [row.id for row in claimed]
+    request_path = None
+    batch_id = None
+    recorded = False
+
+    try:
+        occasions = await service.get_claimed_occasions(db, lease_owner, settings.OCCASION_CLAIM_PAGE_SIZE)
+        request_path = await write_batch_requests(occasions, settings.OCCASION_BATCH_DIR)
+        batch_id = await provider.submit(request_path)
+        await service.record_batch(db, batch_id, lease_owner, occasion_ids, request_path)
+        recorded = True
+    except Exception as e:
+        PROCESSING_ERRORS.labels(stage="batch").inc()
+        logger.error(f"Error submitting occasion batch: {str(e)}")
+    finally:
+        # Also reached when the tick is cancelled on shutdown. A batch that isn't recorded would never be collected,
+        # so it is cancelled rather than paid for twice once its occasions are submitted again.
+        if not recorded:
+            await db.rollback()
+            if batch_id:
+                await cancel_batch(provider, batch_id)
+            remove_batch_files(request_path)
+            await service.release_occasions(db, occasion_ids, lease_owner)
+
+
+async def collect_batch(db: AsyncSession, service: OccasionService, provider, batch: OccasionBatch, worker_id: str):
+    output_path = None
+    try:
+        output_path = await provider.poll(batch.batch_id)
+        if output_path is None:
+            max_wait = batch_max_wait_seconds()
+            if datetime.now(timezone.utc) < as_utc(batch.created) + timedelta(seconds=max_wait):
+                await service.release_batch(db, batch, worker_id)
+                return
+            await cancel_batch(provider, batch.batch_id)
+            raise BatchFailedException(f"Batch {batch.batch_id} did not complete within {max_wait}s")
+
+        await complete_batch_occasions(db, service, batch, output_path)
+        await service.finish_batch(db, batch, "completed")
+        remove_batch_files(batch.request_path)
+        logger.info(f"Collected batch {batch.batch_id}")
+    except BatchFailedException as e:
+        PROCESSING_ERRORS.labels(stage="batch").inc()
+        logger.error(f"Occasion batch {batch.batch_id} failed: {str(e)}")
+        await db.rollback()
+        await service.finish_batch(db, batch, "failed")
+        remove_batch_files(batch.request_path)
+    except Exception as e:
+        # Polling or reading the results failed; the batch is polled again on the next tick
+        PROCESSING_ERRORS.labels(stage="batch").inc()
+        logger.error(f"Error collecting occasion batch {batch.batch_id}: {str(e)}")
+        await db.rollback()
+        await service.release_batch(db, batch, worker_id)
+    finally:
+        remove_batch_files(output_path)
+
+
+async def complete_batch_occasions(db: AsyncSession, service: OccasionService, batch: OccasionBatch, output_path: str):
+    occasion_ids = set(batch.occasion_ids)
+    recurring = []
+    for occasion_id, summary in read_batch_results(output_path):
+        if occasion_id not in occasion_ids:
+            logger.warning(f"Batch {batch.batch_id} returned a result for occasion {occasion_id}, which it doesn't hold")
+            continue
+        occasion = await db.get(Occasion, occasion_id, options=[joinedload(Occasion.user)])
+        if not occasion or occasion.date_processed or occasion.is_draft:
+            continue
+        try:
+            await service.complete_occasion(db, occasion, summary, batch.worker_id, recurring)
+        except Exception as e:
+            PROCESSING_ERRORS.labels(stage="commit").inc()
+            logger.error(f"Error completing occasion {occasion_id} from batch {batch.batch_id}: {str(e)}")
+            await db.rollback()
+    await service.charge_recurring_occasions(db, recurring)
+
+
+def batch_max_wait_seconds():
+    # Give up while the occasions are still leased, so no other worker can claim them while their results may land
+    return min(
+        settings.OCCASION_BATCH_MAX_WAIT_SECONDS,
+        settings.OCCASION_BATCH_LEASE_SECONDS - 2 * settings.OCCASION_BATCH_POLL_SECONDS
+    )
+
+
+async def cancel_batch(provider, batch_id: str):
+    try:
+        await provider.cancel(batch_id)
+    except Exception as e:
+        logger.error(f"Error cancelling batch {batch_id}: {str(e)}")
 
 
 class OccasionTasks():
+    def __init__(self):
+        self.task = None
+        self._stopping = asyncio.Event()
+
     def init(self):
         logger.info("Creating occasion tasks")
         # Start the background task
-        asyncio.create_task(self.schedule_task(process_ocassions))
+        if settings.OCCASION_SCHEDULER_MODE == "event":
+            self.task = asyncio.create_task(self.schedule_event_task(process_ocassions))
+        elif settings.OCCASION_SCHEDULER_MODE == "batch":
+            self.task = asyncio.create_task(
+                self.schedule_task(process_ocassions_batch, settings.OCCASION_BATCH_POLL_SECONDS)
+            )
+        else:
+            self.task = asyncio.create_task(self.schedule_task(process_ocassions))
+        return self.task
+
+    async def stop(self, timeout: float):
+        if not self.task:
+            return
+
+        logger.info("Stopping occasion tasks")
+        self._stopping.set()
+        try:
+            # Let the current tick finish so claimed occasions are committed and released
+            await asyncio.wait_for(asyncio.shield(self.task), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Occasion tasks did not finish within {timeout}s, cancelling")
+            self.task.cancel()
+        except Exception as e:
+            logger.error(f"Occasion tasks stopped with an error: {str(e)}")
+
+    async def schedule_task(self, func, seconds: int = 60):
+        await repeat_func(seconds, lambda: self.run_tick(func), self._stopping)
+
+    async def schedule_event_task(self, func):
+        due_occasion_queue.is_active = True
+        while not self._stopping.is_set():
+            left_backlog = await self.run_tick(lambda db: self._process_and_refresh(func, db))
+            # The backlog is already overdue, so the refresh doesn't queue it; catch up on it straight away
+            if left_backlog:
+                continue
+            await wait_or_stop(
+                due_occasion_queue.wait_for_next_due(settings.OCCASION_SCHEDULER_MAX_SLEEP_SECONDS),
+                self._stopping
+            )
+
+    async def run_tick(self, func):
+        # A fresh session per tick keeps the identity map from accumulating every occasion ever processed
+        db = AsyncSessionLocal()
+        result = None
+        try:
+            result = await func(db)
+        except Exception as e:
+            logger.error(f"Error running scheduled occasion processing: {str(e)}")
+        finally:
+            await db.close()
+        await summary_cache.purge_expired()
+        return result
 
-    async def schedule_task(self, func):
-        db = next(get_db())
-        await repeat_func(60, lambda: func(db))
+    async def _process_and_refresh(self, func, db: AsyncSession):
+        tick_started = datetime.now(timezone.utc)
+        left_backlog = await func(db)
+        await due_occasion_queue.refresh(db, settings.OCCASION_SCHEDULER_QUEUE_SIZE, since=tick_started)
+        return left_backlog
@@ -1,6 +1,8 @@
 from datetime import datetime
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, model_validator
+from typing import List, Optional
+
+from occasions.utils import as_local
 
 
 from enum import Enum
@@ -28,6 +30,13 @@ class OccasionIn(BaseModel):
     date: datetime
     custom_input: Optional[str]
     is_recurring: Optional[bool] = False
+    recurrence_rule: Optional[str] = None
+
+
+class OccasionDeliveryOut(BaseModel):
+    due_at: datetime
+    summary: Optional[str]
+    date_processed: datetime
 
 
 class OccasionOut(OccasionIn):
@@ -35,6 +44,19 @@ class OccasionOut(OccasionIn):
     user_id: int
     email: EmailStr
     date_processed: Optional[datetime]
+    next_due_at: Optional[datetime] = None
     summary: Optional[str]
     created: datetime
     is_draft: Optional[bool] = False
+    utc_offset_minutes: Optional[int] = None
+    deliveries: List[OccasionDeliveryOut] = []
+
+    @model_validator(mode="after")
+    def localise_dates(self):
+        # Occasion dates are returned in the offset they were created in rather than the stored UTC
+        self.date = as_local(self.date, self.utc_offset_minutes)
+        if self.next_due_at:
+            self.next_due_at = as_local(self.next_due_at, self.utc_offset_minutes)
+        for delivery in self.deliveries:
+            delivery.due_at = as_local(delivery.due_at, self.utc_offset_minutes)
+        return self
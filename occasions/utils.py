@@ -0,0 +1,22 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+
+def as_utc(value: datetime):
+    # SQLite hands back naive datetimes for timezone-aware columns; they are always stored as UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def utc_offset_minutes(value: datetime):
+    # Naive datetimes are taken as UTC, like everywhere else
+    offset = value.utcoffset()
+    if offset is None:
+        return None
+    return int(offset.total_seconds() // 60)
+
+
+def as_local(value: datetime, offset_minutes: Optional[int]):
+    # Dates are stored as UTC; shift them back to the offset the user gave them in
+    return as_utc(value).astimezone(timezone(timedelta(minutes=offset_minutes or 0)))
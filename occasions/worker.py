@@ -0,0 +1,59 @@
+import asyncio
+import logging
+import signal
+import sys
+
+from prometheus_client import start_http_server
+
+from config import get_settings
+from db.database import async_engine, engine
+from mail.transports import close_mail_client
+from mail.tasks import OutboxTasks
+from occasions.llm import close_http_client
+from occasions.tasks import OccasionTasks
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+async def run_worker():
+    loop = asyncio.get_running_loop()
+    shutdown = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, shutdown.set)
+
+    if settings.OCCASION_WORKER_METRICS_PORT:
+        start_http_server(settings.OCCASION_WORKER_METRICS_PORT)
+        logger.info(f"Serving worker metrics on port {settings.OCCASION_WORKER_METRICS_PORT}")
+
+    tasks = OccasionTasks()
+    outbox = OutboxTasks()
+    running = {tasks.init()}
+    if settings.MAIL_OUTBOX_DISPATCHER_ENABLED:
+        running.add(outbox.init())
+    shutdown_waiter = asyncio.ensure_future(shutdown.wait())
+    await asyncio.wait(running | {shutdown_waiter}, return_when=asyncio.FIRST_COMPLETED)
+    shutdown_waiter.cancel()
+
+    exit_code = 0
+    exited = [task for task in running if task.done()]
+    if exited:
+        # Background tasks should only stop when asked to; let the process manager restart us
+        for task in exited:
+            logger.error(f"Worker task exited unexpectedly: {task.exception()}")
+        exit_code = 1
+    else:
+        logger.info("Shutdown requested")
+    await tasks.stop(settings.OCCASION_SCHEDULER_SHUTDOWN_TIMEOUT_SECONDS)
+    await outbox.stop(settings.OCCASION_SCHEDULER_SHUTDOWN_TIMEOUT_SECONDS)
+
+    await close_http_client()
+    await close_mail_client()
+    engine.dispose()
+    await async_engine.dispose()
+    return exit_code
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(run_worker()))
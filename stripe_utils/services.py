@@ -1,9 +1,10 @@
 import logging
+import sqlalchemy as sa
 import stripe
 
 from config import get_settings
-from db.database import get_db
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from fastapi import HTTPException, status
 
 logger = logging.getLogger(__name__)
@@ -13,7 +14,7 @@ stripe.api_key = settings.STRIPE_API_KEY
 
 
 class StripeService:
-    def process_webhook_event(self, db: Session, payload: str, stripe_signature: str):
+    async def process_webhook_event(self, db: AsyncSession, payload: str, stripe_signature: str):
         event = self._get_event(payload, stripe_signature)
 
         # Handle the checkout.session.completed event
@@ -24,9 +25,9 @@ class StripeService:
                 event['data']['object']['id'],
                 expand=['line_items'],
             )
-            self.fulfill_order(db, session)
+            await self.fulfill_order(db, session)
 
-    def fulfill_order(self, db: Session, session):
+    async def fulfill_order(self, db: AsyncSession, session):
         try:
             customer_id = session['customer']
             if not customer_id:
@@ -34,14 +35,18 @@ class StripeService:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No customer id found in stripe session")
             quantity = session['line_items']['data'][0]['quantity']
 
-            from users.models import StripeCustomer
-            customer = db.query(StripeCustomer).filter(StripeCustomer.stripe_customer_id == customer_id).first()
+            from users.models import StripeCustomer, User
+            customer = await db.scalar(
+                sa.select(StripeCustomer).options(
+                    joinedload(StripeCustomer.user).joinedload(User.credits)
+                ).where(StripeCustomer.stripe_customer_id == customer_id)
+            )
             if not customer:
                 logger.error(f"No user found for customer id: {customer_id}")
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No user found for customer id")
 
             customer.user.add_credits(quantity)
-            db.commit()
+            await db.commit()
         except Exception as e:
             logger.error(f"An error occurred while fulfilling order: {e}")
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An error occurred while fulfilling order")
@@ -57,22 +62,21 @@ class StripeService:
             logger.error(f"Invalid signature for stripe webhook. Error: {e}")
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid signature")
 
-    def create_customer_for_user(self, user):
+    async def create_customer_for_user(self, db: AsyncSession, user):
         from users.models import StripeCustomer
 
-        db = next(get_db())
-
         customer = stripe.Customer.create(email=user.email)
         stripe_customer = StripeCustomer(user_id=user.id, stripe_customer_id=customer.id)
         db.add(stripe_customer)
-        db.commit()
-        db.refresh(stripe_customer)
+        await db.commit()
+        await db.refresh(stripe_customer)
         return stripe_customer
 
-    def create_checkout_session(self, user, quantity):
+    async def create_checkout_session(self, db: AsyncSession, user, quantity):
+        stripe_customer = await user.get_stripe_customer(db)
         return stripe.checkout.Session.create(
             ui_mode='embedded',
-            customer=user.get_stripe_customer().stripe_customer_id,
+            customer=stripe_customer.stripe_customer_id,
             line_items=[
                 {
                     'price': settings.STRIPE_PRICE_ID,
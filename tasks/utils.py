@@ -0,0 +1,27 @@
+import asyncio
+import os
+import socket
+import uuid
+
+from typing import Optional
+
+# Identifies this process when claiming occasions or outbox messages so leases can be told apart across workers
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+async def repeat_func(seconds: int, func, stopping: Optional[asyncio.Event] = None):
+    while not (stopping and stopping.is_set()):
+        await func()
+        await wait_or_stop(asyncio.sleep(seconds), stopping)
+
+
+async def wait_or_stop(awaitable, stopping: Optional[asyncio.Event]):
+    if not stopping:
+        await awaitable
+        return
+
+    waiter = asyncio.ensure_future(awaitable)
+    stopper = asyncio.ensure_future(stopping.wait())
+    await asyncio.wait({waiter, stopper}, return_when=asyncio.FIRST_COMPLETED)
+    for task in (waiter, stopper):
+        task.cancel()
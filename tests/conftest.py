@@ -0,0 +1,39 @@
+import os
+import sys
+import tempfile
+
+# Settings are read when the app modules are imported, so the environment has to be in place first
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for name, value in {
+    "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'tests.db')}",
+    "JWT_SALT": "test",
+    "JWT_ALGORITHM": "HS256",
+    "JWT_EXP_MINUTES": "30",
+    "MAILGUN_API_KEY": "test",
+    "NEXT_PUBLIC_URL": "http://localhost",
+    "OPENAI_API_KEY": "test",
+    "STRIPE_API_KEY": "test",
+    "STRIPE_WEBHOOK_SECRET": "test",
+    "STRIPE_PRICE_ID": "test",
+    "GOOGLE_CLIENT_ID": "test",
+    "REFRESH_TOKEN_SALT": "test",
+    "OCCASION_SCHEDULER_ENABLED": "false",
+    "MAIL_OUTBOX_DISPATCHER_ENABLED": "false",
+    # The LLM is stubbed in tests, so neither the provider's rate limits nor a summary cache apply
+    "LLM_REQUESTS_PER_MINUTE": "1000000000",
+    "LLM_TOKENS_PER_MINUTE": "1000000000",
+    "SUMMARY_CACHE_BACKEND": "none",
+}.items():
+    os.environ[name] = value
+
+import pytest  # noqa: E402
+
+import main  # noqa: E402,F401
+from db.database import Base, engine  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    Base.metadata.create_all(engine)
+    yield
+    Base.metadata.drop_all(engine)
@@ -0,0 +1,56 @@
+from datetime import datetime, timezone, timedelta
+
+import pytest
+
+from occasions.recurrence import next_occurrence, parse_rule
+
+
+def at(value: str):
+    return datetime.fromisoformat(value)
+
+
+def test_parse_rule():
+    assert parse_rule("FREQ=YEARLY") == ("YEARLY", 1)
+    assert parse_rule("RRULE:freq=monthly;interval=3") == ("MONTHLY", 3)
+
+
+@pytest.mark.parametrize("rule", ["FREQ=DAILY", "INTERVAL=2", "FREQ=MONTHLY;INTERVAL=0", "FREQ=MONTHLY;INTERVAL=x",
+                                  "FREQ=YEARLY;BYMONTH=2"])
+def test_parse_rule_rejects_unsupported_rules(rule):
+    with pytest.raises(ValueError):
+        parse_rule(rule)
+
+
+def test_leap_day_falls_on_feb_28_and_returns_to_feb_29():
+    start = at("2024-02-29T09:00:00+00:00")
+    assert next_occurrence("FREQ=YEARLY", start, start) == at("2025-02-28T09:00:00+00:00")
+    assert next_occurrence("FREQ=YEARLY", start, at("2027-03-01T00:00:00+00:00")) == at("2028-02-29T09:00:00+00:00")
+
+
+def test_month_end_is_clamped_without_drifting():
+    start = at("2024-01-31T09:00:00+00:00")
+    assert next_occurrence("FREQ=MONTHLY", start, start) == at("2024-02-29T09:00:00+00:00")
+    assert next_occurrence("FREQ=MONTHLY", start, at("2024-02-29T09:00:00+00:00")) == at("2024-03-31T09:00:00+00:00")
+    assert next_occurrence("FREQ=MONTHLY;INTERVAL=3", start, start) == at("2024-04-30T09:00:00+00:00")
+
+
+def test_month_end_is_clamped_on_the_local_day():
+    # Stored as 2024-03-30T15:00Z; stepping in UTC would land on May 1 local
+    start = at("2024-03-31T00:00:00+09:00").astimezone(timezone.utc)
+    occurrence = next_occurrence("FREQ=MONTHLY", start, start, 9 * 60)
+    assert occurrence == at("2024-04-30T00:00:00+09:00")
+    assert occurrence.tzinfo == timezone.utc
+
+
+def test_yearly_occurrence_keeps_the_local_day():
+    # Stored as 2024-02-29T02:00Z; stepping in UTC would land on Feb 27 local
+    start = at("2024-02-28T21:00:00-05:00").astimezone(timezone.utc)
+    assert next_occurrence("FREQ=YEARLY", start, start, -5 * 60) == at("2025-02-28T21:00:00-05:00")
+
+
+def test_occurrence_is_after_the_given_time():
+    start = at("2020-06-15T12:00:00+02:00").astimezone(timezone.utc)
+    after = at("2026-06-15T10:00:00+00:00")
+    occurrence = next_occurrence("FREQ=YEARLY", start, after, 120)
+    assert occurrence == at("2027-06-15T12:00:00+02:00")
+    assert occurrence - after > timedelta(0)
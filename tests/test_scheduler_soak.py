@@ -0,0 +1,108 @@
+import asyncio
+import gc
+import logging
+from datetime import datetime, timezone, timedelta
+
+import sqlalchemy as sa
+
+from db.database import AsyncSessionLocal
+from mail.models import EmailOutbox
+from occasions.models import Occasion
+from occasions.services import OccasionService
+from occasions.tasks import OccasionTasks, process_ocassions
+from users.models import Credits, User
+
+TICKS = 10000
+WARM_UP_TICKS = 1000
+OCCASIONS_PER_TICK = 3
+MAX_RSS_GROWTH_KB = 16 * 1024
+
+
+def rss_kb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    raise RuntimeError("VmRSS not found")
+
+
+async def create_occasions():
+    now = datetime.now(timezone.utc)
+    async with AsyncSessionLocal() as db:
+        user = User(created=now, email="soak@example.com")
+        db.add(user)
+        await db.flush()
+        db.add(Credits(user_id=user.id, credits=0))
+        occasions = [
+            Occasion(
+                created=now,
+                label=f"Soak {i}",
+                type="birthday",
+                tone="normal",
+                email=user.email,
+                date=now,
+                next_due_at=now,
+                user_id=user.id
+            )
+            for i in range(OCCASIONS_PER_TICK)
+        ]
+        db.add_all(occasions)
+        await db.commit()
+        return [occasion.id for occasion in occasions]
+
+
+async def rearm(occasion_ids):
+    # Make the same occasions due again, and drop the emails they queued, so every tick does the same work
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            sa.update(Occasion).where(Occasion.id.in_(occasion_ids)).values({
+                Occasion.date_processed: None,
+                Occasion.summary: None,
+                Occasion.next_due_at: datetime.now(timezone.utc) - timedelta(seconds=1)
+            }),
+            execution_options={"synchronize_session": False}
+        )
+        await db.execute(sa.delete(EmailOutbox))
+        await db.commit()
+
+
+def test_scheduler_ticks_keep_memory_flat(monkeypatch, caplog):
+    # Captured per-occasion log lines would otherwise count against the RSS budget
+    caplog.set_level(logging.WARNING)
+
+    async def stub_summary_chain(self, inputs):
+        return f"Summary for {inputs['occasion_label']}"
+
+    monkeypatch.setattr(OccasionService, "_invoke_summary_chain", stub_summary_chain)
+
+    async def soak():
+        occasion_ids = await create_occasions()
+        tasks = OccasionTasks()
+        identity_map_sizes = []
+        processed = 0
+        warm_rss = None
+
+        async def tick(db):
+            await process_ocassions(db)
+            identity_map_sizes.append(len(db.identity_map))
+
+        for i in range(TICKS):
+            await rearm(occasion_ids)
+            await tasks.run_tick(tick)
+            async with AsyncSessionLocal() as db:
+                processed += await db.scalar(
+                    sa.select(sa.func.count()).select_from(Occasion).where(Occasion.date_processed.isnot(None))
+                )
+            if i + 1 == WARM_UP_TICKS:
+                gc.collect()
+                warm_rss = rss_kb()
+
+        gc.collect()
+        return identity_map_sizes, processed, warm_rss, rss_kb()
+
+    identity_map_sizes, processed, warm_rss, final_rss = asyncio.run(soak())
+
+    assert processed == TICKS * OCCASIONS_PER_TICK
+    assert len(identity_map_sizes) == TICKS
+    assert max(identity_map_sizes[WARM_UP_TICKS:]) <= max(identity_map_sizes[:WARM_UP_TICKS])
+    assert final_rss - warm_rss < MAX_RSS_GROWTH_KB
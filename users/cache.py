@@ -0,0 +1,103 @@
+import logging
+import time
+
+from collections import OrderedDict
+from itertools import chain
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+from typing import Iterable, Optional
+
+from config import get_settings
+from users.models import Credits, User
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def _copy(instance):
+    mapper = inspect(type(instance))
+    return mapper.class_(**{attr.key: getattr(instance, attr.key) for attr in mapper.column_attrs})
+
+
+class UserCache:
+    def __init__(self, max_size: int, ttl_seconds: int):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        # Token subject -> (expires_at, detached snapshot of the user and their credits)
+        self._entries = OrderedDict()
+        self._subjects = {}
+
+    async def get(self, db: AsyncSession, subject: str) -> Optional[User]:
+        if self.ttl_seconds <= 0:
+            return None
+
+        entry = self._entries.get(subject)
+        if not entry or entry[0] <= time.monotonic():
+            self.misses += 1
+            if entry:
+                self._drop(subject)
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(subject)
+        # load=False attaches a copy of the snapshot to this request's session without querying
+        return await db.merge(entry[1], load=False)
+
+    def set(self, subject: str, user: User):
+        if self.ttl_seconds <= 0:
+            return
+
+        snapshot = _copy(user)
+        if user.credits:
+            snapshot.credits = _copy(user.credits)
+            make_transient_to_detached(snapshot.credits)
+        make_transient_to_detached(snapshot)
+        self._entries[subject] = (time.monotonic() + self.ttl_seconds, snapshot)
+        self._entries.move_to_end(subject)
+        self._subjects.setdefault(user.id, set()).add(subject)
+        while len(self._entries) > self.max_size:
+            self._drop(next(iter(self._entries)))
+
+    def invalidate(self, user_ids: Iterable[int]):
+        for user_id in user_ids:
+            for subject in self._subjects.pop(user_id, ()):
+                self._entries.pop(subject, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._subjects.clear()
+
+    def _drop(self, subject: str):
+        _, snapshot = self._entries.pop(subject)
+        subjects = self._subjects.get(snapshot.id)
+        if subjects:
+            subjects.discard(subject)
+            if not subjects:
+                del self._subjects[snapshot.id]
+
+
+user_cache = UserCache(max_size=settings.USER_CACHE_MAX_SIZE, ttl_seconds=settings.USER_CACHE_TTL_SECONDS)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session: Session, flush_context):
+    # new/dirty/deleted still hold the pre-flush state here
+    changed = session.info.setdefault("changed_user_ids", set())
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, User):
+            changed.add(instance.id)
+        elif isinstance(instance, Credits):
+            changed.add(instance.user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session: Session):
+    user_cache.invalidate(session.info.pop("changed_user_ids", ()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session: Session):
+    session.info.pop("changed_user_ids", None)
@@ -1,18 +1,143 @@
+import asyncio
+import base64
+import hashlib
+import httpx
 import logging
-from google.oauth2 import id_token
-from google.auth.transport import requests
+import re
+import rsa
+import time
+
+from collections import OrderedDict
+from functools import lru_cache
+from google.auth import jwt
 from config import get_settings
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
+
+
+@lru_cache
+def get_google_http_client():
+    return httpx.AsyncClient(timeout=settings.GOOGLE_HTTP_TIMEOUT_SECONDS)
+
+
+async def close_google_http_client():
+    if get_google_http_client.cache_info().currsize:
+        await get_google_http_client().aclose()
+        get_google_http_client.cache_clear()
+
+
+def _max_age(headers: httpx.Headers):
+    cache_control = headers.get("cache-control", "")
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0
+    match = MAX_AGE_PATTERN.search(cache_control)
+    if not match:
+        return settings.GOOGLE_CERTS_DEFAULT_MAX_AGE_SECONDS
+    try:
+        age = int(headers.get("age", 0))
+    except ValueError:
+        age = 0
+    return max(0, int(match.group(1)) - age)
+
+
+def _base64url_int(value: str):
+    return int.from_bytes(base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)), "big")
+
+
+def _parse_certs(payload: dict):
+    # Accepts Google's v1 format ({kid: x509 PEM}) and JWKS ({"keys": [...]}) such as the v3 endpoint
+    if "keys" not in payload:
+        return payload
+    certs = {}
+    for key in payload["keys"]:
+        if key.get("kty") == "RSA" and key.get("kid"):
+            public_key = rsa.PublicKey(_base64url_int(key["n"]), _base64url_int(key["e"]))
+            certs[key["kid"]] = public_key.save_pkcs1().decode("ascii")
+    return certs
+
+
+class GoogleCertCache:
+    def __init__(self, url: str):
+        self.url = url
+        self.fetches = 0
+        self._certs = {}
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self, key_id: str):
+        if time.monotonic() >= self._expires_at or key_id not in self._certs:
+            async with self._lock:
+                # Another request may have refreshed the certs while this one waited
+                if time.monotonic() >= self._expires_at or (key_id not in self._certs and self._can_refetch()):
+                    await self._fetch()
+        return self._certs.get(key_id)
+
+    def _can_refetch(self):
+        # An unknown key id may mean Google rotated keys early, but don't let bogus tokens force a fetch each time
+        return time.monotonic() - self._fetched_at >= settings.GOOGLE_CERTS_MIN_REFRESH_SECONDS
+
+    async def _fetch(self):
+        response = await get_google_http_client().get(self.url)
+        response.raise_for_status()
+        self._certs = _parse_certs(response.json())
+        self.fetches += 1
+        self._fetched_at = time.monotonic()
+        self._expires_at = self._fetched_at + _max_age(response.headers)
+        logger.info(f"Fetched {len(self._certs)} Google signing certs, cached for {self._expires_at - self._fetched_at:.0f}s")
+
+
+class VerifiedTokenCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def key(token: str):
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str):
+        key = self.key(token)
+        entry = self._entries.get(key)
+        if not entry:
+            return None
+        expires_at, claims = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return claims
+
+    def set(self, token: str, claims: dict):
+        key = self.key(token)
+        self._entries[key] = (claims["exp"], claims)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+google_certs = GoogleCertCache(settings.GOOGLE_CERTS_URL)
+verified_google_tokens = VerifiedTokenCache(settings.GOOGLE_TOKEN_CACHE_MAX_SIZE)
+
+
+async def verify_google_token(token: str):
+    idinfo = verified_google_tokens.get(token)
+    if idinfo:
+        return idinfo
 
-def verify_google_token(token: str):
     try:
-        # Decode without verification to check the payload
-        idinfo = id_token.verify_oauth2_token(token, requests.Request(), settings.GOOGLE_CLIENT_ID)
-        if idinfo['iss'] not in ['accounts.google.com', 'https://accounts.google.com']:
+        key_id = jwt.decode_header(token).get("kid")
+        cert = await google_certs.get(key_id)
+        if not cert:
+            raise ValueError('Unknown signing key.')
+        idinfo = jwt.decode(token, certs={key_id: cert}, audience=settings.GOOGLE_CLIENT_ID)
+        if idinfo['iss'] not in GOOGLE_ISSUERS:
             raise ValueError('Wrong issuer.')
+        verified_google_tokens.set(token, idinfo)
         return idinfo
     except Exception as e:
         logger.error(f"Error verifying Google token: {e}")
@@ -0,0 +1,21 @@
+from prometheus_client import Gauge, Histogram
+
+QUEUE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+HASH_BUCKETS = (0.01, 0.05, 0.1, 0.2, 0.3, 0.5, 1, 2.5)
+
+PASSWORD_HASH_QUEUE_TIME = Histogram(
+    "password_hash_queue_seconds",
+    "Time a password hash or verification waited for a free hashing thread",
+    ["operation"],
+    buckets=QUEUE_BUCKETS
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds",
+    "Time spent hashing or verifying a password",
+    ["operation"],
+    buckets=HASH_BUCKETS
+)
+PASSWORD_HASH_IN_FLIGHT = Gauge(
+    "password_hash_in_flight",
+    "Password hashes and verifications queued or running"
+)
@@ -1,12 +1,9 @@
 from db.database import Base
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, select
 from sqlalchemy.orm import relationship
 from datetime import datetime, timedelta, timezone
-from passlib.context import CryptContext
 from stripe_utils.services import StripeService
-
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from users.passwords import verify_password
 
 
 class User(Base):
@@ -26,20 +23,24 @@ class User(Base):
     email_verifications = relationship("EmailVerification", back_populates="user")
     password_resets = relationship("PasswordReset", back_populates="user")
     refresh_token = Column(String, nullable=True)
+    locale = Column(String, nullable=True)
 
-    def get_stripe_customer(self):
-        if self.stripe_customer:
-            return self.stripe_customer
-        return StripeService().create_customer_for_user(self)
+    async def get_stripe_customer(self, db):
+        # Queried rather than lazy loaded: async sessions can't load relationships on attribute access
+        stripe_customer = await db.scalar(select(StripeCustomer).where(StripeCustomer.user_id == self.id))
+        if stripe_customer:
+            return stripe_customer
+        return await StripeService().create_customer_for_user(db, self)
 
     def add_credits(self, quantity):
         if not self.credits:
             self.credits = Credits(user_id=self.id, credits=quantity)
         else:
-            self.credits.credits += quantity
+            # Incremented in SQL so a balance read from the user cache can't overwrite a newer one
+            self.credits.credits = Credits.credits + quantity
 
-    def check_password(self, password):
-        return pwd_context.verify(password, self.hashed_password)
+    async def check_password(self, password):
+        return await verify_password(password, self.hashed_password)
 
 
 class StripeCustomer(Base):
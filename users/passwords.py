@@ -0,0 +1,42 @@
+import asyncio
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+
+from config import get_settings
+from users.metrics import PASSWORD_HASH_DURATION, PASSWORD_HASH_IN_FLIGHT, PASSWORD_HASH_QUEUE_TIME
+
+settings = get_settings()
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# bcrypt releases the GIL, so a few threads hash in parallel while the event loop keeps serving requests.
+# The pool size caps how much CPU a login burst can take; further calls queue here.
+_executor = ThreadPoolExecutor(
+    max_workers=max(1, settings.PASSWORD_HASH_MAX_WORKERS),
+    thread_name_prefix="password-hash"
+)
+
+
+async def _run(operation: str, func, *args):
+    submitted = time.perf_counter()
+
+    def timed():
+        PASSWORD_HASH_QUEUE_TIME.labels(operation=operation).observe(time.perf_counter() - submitted)
+        with PASSWORD_HASH_DURATION.labels(operation=operation).time():
+            return func(*args)
+
+    with PASSWORD_HASH_IN_FLIGHT.track_inprogress():
+        return await asyncio.get_running_loop().run_in_executor(_executor, timed)
+
+
+async def hash_password(password: str):
+    return await _run("hash", pwd_context.hash, password)
+
+
+async def verify_password(password: str, hashed_password: str):
+    return await _run("verify", pwd_context.verify, password, hashed_password)
+
+
+def shutdown_password_executor():
+    _executor.shutdown(wait=False, cancel_futures=True)
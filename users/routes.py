@@ -1,8 +1,8 @@
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Header
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated
-from db.database import get_db
+from db.database import get_async_db
 from stripe_utils.services import StripeService
 from users.models import User
 from users.services import UserService, UserAuthenticationService
@@ -28,7 +28,7 @@ async def read_users_me(current_user: Annotated[User, Depends(get_current_user)]
 
 
 @router.get("/users", response_model=list[UserOut])
-async def users(current_user: Annotated[User, Depends(get_current_user)], db: Session = Depends(get_db)):
+async def users(current_user: Annotated[User, Depends(get_current_user)], db: AsyncSession = Depends(get_async_db)):
     if not current_user.is_superuser:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
 
@@ -36,7 +36,7 @@ async def users(current_user: Annotated[User, Depends(get_current_user)], db: Se
 
 
 @router.post("/google-login")
-async def google_login(user: GoogleUserIn, db: Session = Depends(get_db)):
+async def google_login(user: GoogleUserIn, db: AsyncSession = Depends(get_async_db)):
     from users.services import UserAuthenticationService
     try:
         await UserAuthenticationService().google_login(db, user)
@@ -47,12 +47,12 @@ async def google_login(user: GoogleUserIn, db: Session = Depends(get_db)):
 
 
 @router.post("/login")
-async def login(user: UserIn, db: Session = Depends(get_db)):
+async def login(user: UserIn, db: AsyncSession = Depends(get_async_db)):
     return await UserAuthenticationService().login(db, user.email, user.password)
 
 
 @router.post("/signup")
-async def signup(user: UserIn, db: Session = Depends(get_db)):
+async def signup(user: UserIn, db: AsyncSession = Depends(get_async_db)):
     try:
         return await UserAuthenticationService().signup(db, user)
     except Exception as e:
@@ -61,13 +61,13 @@ async def signup(user: UserIn, db: Session = Depends(get_db)):
 
 
 @router.post("/send-email-verification")
-async def send_email_verification(current_user: Annotated[User, Depends(get_current_user)], db: Session = Depends(get_db)):
+async def send_email_verification(current_user: Annotated[User, Depends(get_current_user)], db: AsyncSession = Depends(get_async_db)):
     await UserService().init_email_verification(db, current_user)
     return {"status": "success", "message": "Verification email sent successfully"}
 
 
 @router.post("/token/refresh")
-async def refresh_token(refresh: RefreshTokenReq, db: Session = Depends(get_db)):
+async def refresh_token(refresh: RefreshTokenReq, db: AsyncSession = Depends(get_async_db)):
     return await UserAuthenticationService().refresh_token(db, refresh.refresh_token)
 
 
@@ -75,10 +75,10 @@ async def refresh_token(refresh: RefreshTokenReq, db: Session = Depends(get_db))
 async def stripe_webhook(
         stripe_signature: Annotated[str, Header(alias="stripe-signature")],
         request: Request,
-        db: Session = Depends(get_db)):
+        db: AsyncSession = Depends(get_async_db)):
     try:
         payload = await request.body()
-        StripeService().process_webhook_event(db, payload, stripe_signature)
+        await StripeService().process_webhook_event(db, payload, stripe_signature)
         return {"status": "success"}
     except Exception as e:
         logger.error(f"An error occurred while processing the Stripe webhook: {e}")
@@ -86,9 +86,13 @@ async def stripe_webhook(
 
 
 @router.post("/checkout")
-async def checkout(user: Annotated[User, Depends(get_current_user)], request: CheckoutRequest):
+async def checkout(
+    user: Annotated[User, Depends(get_current_user)],
+    request: CheckoutRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
     try:
-        session = StripeService().create_checkout_session(user, request.quantity)
+        session = await StripeService().create_checkout_session(db, user, request.quantity)
         return {"client_secret": session.client_secret}
     except Exception as e:
         logger.error(f"An error occurred while creating checkout session: {e}")
@@ -99,7 +103,7 @@ async def checkout(user: Annotated[User, Depends(get_current_user)], request: Ch
 async def submit_feedback(
     feedback_request: FeedbackRequest,
     current_user: Annotated[User | None, Depends(get_current_user_or_none)],
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         await UserService().create_feedback(db, feedback_request.feedback, current_user)
@@ -113,14 +117,14 @@ async def submit_feedback(
 
 
 @router.post("/verify-email/{token}")
-async def verify_email(token: str, db: Session = Depends(get_db)):
+async def verify_email(token: str, db: AsyncSession = Depends(get_async_db)):
     if await UserService().verify_email(db, token):
         return {"message": "Email verified successfully"}
     raise HTTPException(status_code=400, detail="Invalid or expired token")
 
 
 @router.post("/request-password-reset", status_code=status.HTTP_200_OK)
-async def request_password_reset(request: PasswordResetRequest, db: Session = Depends(get_db)):
+async def request_password_reset(request: PasswordResetRequest, db: AsyncSession = Depends(get_async_db)):
     logger.info(f"Requesting password reset for {request.email}")
     user = await UserService().get_user_by_email(db, request.email)
     if not user:
@@ -129,5 +133,5 @@ async def request_password_reset(request: PasswordResetRequest, db: Session = De
 
 
 @router.post("/reset-password", status_code=status.HTTP_200_OK)
-async def reset_password(request: PasswordReset, db: Session = Depends(get_db)):
+async def reset_password(request: PasswordReset, db: AsyncSession = Depends(get_async_db)):
     return await UserAuthenticationService().reset_password(db, request.reset_hash, request.new_password)
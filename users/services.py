@@ -1,19 +1,19 @@
-import asyncio
 import logging
 from datetime import datetime, timedelta, timezone
 from fastapi import HTTPException, status
 from jose import jwt
-from sqlalchemy.orm import Session
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from config import get_settings
-from mail.services import MailService
-from passlib.context import CryptContext
+from mail.services import OutboxService
+from users.passwords import hash_password
 from users.models import User, Credits, Feedback, EmailVerification, PasswordReset
 from users.types import GoogleUserIn, UserIn
 import secrets
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 class UserService:
@@ -23,25 +23,28 @@ class UserService:
             created=datetime.now(timezone.utc),
             email=user.email,
             google_id=user.google_id if hasattr(user, 'google_id') else None,
-            hashed_password=pwd_context.hash(user.password) if hasattr(user, 'password') else None
+            hashed_password=await hash_password(user.password) if hasattr(user, 'password') else None
         )
         db.add(db_user)
-        db.commit()
+        await db.commit()
 
         # Credits module
         credits = Credits(user_id=db_user.id, credits=1)
         db.add(credits)
-        db.commit()
+        await db.commit()
 
-        db.refresh(db_user)
+        await db.refresh(db_user)
 
         return db_user
 
-    async def get_user_by_email(self, db, email):
-        return db.query(User).filter(User.email == email).first()
+    async def get_user_by_email(self, db, email, load_credits=False):
+        query = sa.select(User).where(User.email == email)
+        if load_credits:
+            query = query.options(joinedload(User.credits))
+        return await db.scalar(query)
 
     async def get_all_users(self, db):
-        return db.query(User).all()
+        return (await db.scalars(sa.select(User).options(joinedload(User.credits)))).all()
 
     async def _validate_unique_email(self, db, email):
         # Normalize the email by removing any part after a '+' sign before the '@' symbol
@@ -52,18 +55,18 @@ class UserService:
         if '+' in local_part:
             raise ValueError("Subdomain emails are not allowed")
 
-        user = db.query(User).filter(User.email == cleaned_email).count()
+        user = await db.scalar(sa.select(sa.func.count()).select_from(User).where(User.email == cleaned_email))
         if user:
             raise ValueError("Email already registered")
 
-    async def create_feedback(self, db: Session, feedback: str, user: User = None):
+    async def create_feedback(self, db: AsyncSession, feedback: str, user: User = None):
         db_feedback = Feedback(feedback=feedback, user_id=user.id if user else None)
         db.add(db_feedback)
-        db.commit()
-        db.refresh(db_feedback)
+        await db.commit()
+        await db.refresh(db_feedback)
         return db_feedback
 
-    async def init_email_verification(self, db: Session, user: User) -> str:
+    async def init_email_verification(self, db: AsyncSession, user: User) -> str:
         token = secrets.token_urlsafe(32)
         verification = EmailVerification(
             user_id=user.id,
@@ -72,54 +75,53 @@ class UserService:
             expires_at=datetime.now(timezone.utc) + timedelta(days=1)
         )
         db.add(verification)
-        db.commit()
-
-        asyncio.create_task(self.send_verification_email(db, token, user))
+        self.queue_verification_email(db, token, user)
+        await db.commit()
 
         return token
 
-    async def send_verification_email(self, db: Session, token: str, user: User):
+    def queue_verification_email(self, db: AsyncSession, token: str, user: User):
         verification_url = f"{settings.NEXT_PUBLIC_URL}/verify-email/?token={token}"
-        MailService().send_verification_email(user.email, verification_url)
+        OutboxService().enqueue_verification_email(db, user.email, verification_url, locale=user.locale)
         return verification_url
 
-    async def verify_email(self, db: Session, token: str) -> bool:
-        verification = db.query(EmailVerification).filter(
+    async def verify_email(self, db: AsyncSession, token: str) -> bool:
+        verification = await db.scalar(sa.select(EmailVerification).options(joinedload(EmailVerification.user)).where(
             EmailVerification.token == token,
             EmailVerification.expires_at > datetime.now(timezone.utc)
-        ).first()
+        ))
 
         if verification:
             user = verification.user
             user.is_email_verified = True
-            db.delete(verification)
-            db.commit()
+            await db.delete(verification)
+            await db.commit()
             return True
         return False
 
 
 class UserAuthenticationService(UserService):
     async def google_login(self, db, user: GoogleUserIn):
-        db_user = db.query(User).filter(
+        db_user = await db.scalar(sa.select(User).where(
             (User.google_id == user.google_id) | (User.email == user.email)
-        ).first()
+        ))
         if not db_user:
             db_user = await self.create_user(db, user)
             db_user.is_email_verified = True
-            db.commit()
+            await db.commit()
         elif not db_user.google_id and user.google_id:
             db_user.google_id = user.google_id
-            db.commit()
+            await db.commit()
         return db_user
 
     async def login(self, db, email, password):
-        db_user = db.query(User).filter(User.email == email).first()
+        db_user = await db.scalar(sa.select(User).where(User.email == email))
         if not db_user:
             raise ValueError("User not found")
-        if not db_user.check_password(password):
+        if not await db_user.check_password(password):
             raise ValueError("Invalid password")
 
-        access_token, expires_at, refresh_token = self.create_auth_tokens(db, db_user, data={"sub": email})
+        access_token, expires_at, refresh_token = await self.create_auth_tokens(db, db_user, data={"sub": email})
         return {
             "id": db_user.id,
             "access_token": access_token,
@@ -129,9 +131,9 @@ class UserAuthenticationService(UserService):
 
     async def signup(self, db, user: UserIn):
         db_user = await self.create_user(db, user)
-        asyncio.create_task(self.init_email_verification(db, db_user))
+        await self.init_email_verification(db, db_user)
 
-        access_token, expires_at, refresh_token = self.create_auth_tokens(db, db_user, data={"sub": db_user.email})
+        access_token, expires_at, refresh_token = await self.create_auth_tokens(db, db_user, data={"sub": db_user.email})
         return {
             "id": db_user.id,
             "access_token": access_token,
@@ -139,11 +141,11 @@ class UserAuthenticationService(UserService):
             "refresh_token": refresh_token
         }
 
-    def create_auth_tokens(self, db, user, data: dict):
+    async def create_auth_tokens(self, db, user, data: dict):
         access_token, expires_at = self._create_access_token(data)
         refresh_token = self._create_refresh_token(data)
         user.refresh_token = refresh_token
-        db.commit()
+        await db.commit()
         return access_token, expires_at, refresh_token
 
     def _create_access_token(self, data: dict):
@@ -160,14 +162,14 @@ class UserAuthenticationService(UserService):
         encoded_jwt = jwt.encode(to_encode, settings.REFRESH_TOKEN_SALT, algorithm=settings.JWT_ALGORITHM)
         return encoded_jwt
 
-    async def refresh_token(self, db: Session, refresh_token: str):
+    async def refresh_token(self, db: AsyncSession, refresh_token: str):
         try:
             payload = jwt.decode(refresh_token, settings.REFRESH_TOKEN_SALT, algorithms=[settings.JWT_ALGORITHM])
             email: str = payload.get("sub")
         except jwt.JWTError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
 
-        user = db.query(User).filter(User.email == email).first()
+        user = await db.scalar(sa.select(User).where(User.email == email))
         if not user or user.refresh_token != refresh_token:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
 
@@ -176,7 +178,8 @@ class UserAuthenticationService(UserService):
 
     async def request_password_reset(self, db, user):
         reset_hash = await self.generate_reset_hash(db, user)
-        MailService().send_password_reset_email(user.email, reset_hash)
+        OutboxService().enqueue_password_reset_email(db, user.email, reset_hash, locale=user.locale)
+        await db.commit()
         return {"message": "Password reset email sent"}
 
     async def generate_reset_hash(self, db, user):
@@ -188,12 +191,13 @@ class UserAuthenticationService(UserService):
             expires_at=datetime.now(timezone.utc) + timedelta(hours=1)
         )
         db.add(password_reset)
-        db.commit()
 
         return reset_hash
 
     async def reset_password(self, db, reset_hash, new_password):
-        password_reset = db.query(PasswordReset).filter(PasswordReset.token == reset_hash).first()
+        password_reset = await db.scalar(
+            sa.select(PasswordReset).options(joinedload(PasswordReset.user)).where(PasswordReset.token == reset_hash)
+        )
         if not password_reset:
             raise ValueError("Invalid reset hash")
 
@@ -201,9 +205,9 @@ class UserAuthenticationService(UserService):
             raise ValueError("Reset hash expired")
 
         user = password_reset.user
-        user.hashed_password = pwd_context.hash(new_password)
+        user.hashed_password = await hash_password(new_password)
 
-        db.delete(password_reset)
-        db.commit()
+        await db.delete(password_reset)
+        await db.commit()
 
         return {"message": "Password reset successfully"}
@@ -1,10 +1,11 @@
-from db.database import get_db
+from db.database import get_async_db
 from jose import jwt, JWTError
 from jwt import InvalidTokenError
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated
+from users.cache import user_cache
 from users.services import UserService
 from users.google_auth import verify_google_token
 from users.models import User
@@ -14,9 +15,20 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 settings = get_settings()
 
 
+async def get_authenticated_user(db: AsyncSession, email: str):
+    user = await user_cache.get(db, email)
+    if user:
+        return user
+
+    user = await UserService().get_user_by_email(db, email, load_credits=True)
+    if user:
+        user_cache.set(email, user)
+    return user
+
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if not token:
         raise HTTPException(
@@ -35,17 +47,17 @@ async def get_current_user(
         payload = jwt.decode(token, settings.JWT_SALT, algorithms=[settings.JWT_ALGORITHM])
         email = payload.get("sub")
         if email:
-            user = await UserService().get_user_by_email(db, email)
+            user = await get_authenticated_user(db, email)
             if user:
                 return user
     except JWTError:
         # If JWT decoding fails, try Google token verification
         try:
-            user_dict = verify_google_token(token)
+            user_dict = await verify_google_token(token)
             if user_dict:
                 email = user_dict.get('email')
                 if email:
-                    user = await UserService().get_user_by_email(db, email)
+                    user = await get_authenticated_user(db, email)
                     if user:
                         return user
         except InvalidTokenError:
@@ -59,7 +71,7 @@ anon_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
 async def get_current_user_or_none(
     token: str | None = Depends(anon_oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     if not token:
         return None